@@ -0,0 +1,63 @@
+import os
+
+import pygame
+
+DATA_DIR = 'data'  # папка со всеми картинками игры
+
+PACMAN_FRAMES = {
+    97: ('pcmn_circ.png', 'pcmn_left_2.png', 'pcmn_left_3.png'),  # A
+    115: ('pcmn_circ.png', 'pcmn_down_2.png', 'pcmn_down_3.png'),  # S
+    100: ('pcmn_circ.png', 'pcmn_right_2.png', 'pcmn_right_3.png'),  # D
+    119: ('pcmn_circ.png', 'pcmn_up_2.png', 'pcmn_up_3.png'),  # W
+}
+# кадры анимации пакмана по кнопке направления, индекс - значение счетчика count % 3
+
+
+class Assets:
+    # кэш картинок: каждая картинка из data/ грузится с диска один раз
+    def __init__(self, path=DATA_DIR):
+        self.path = path
+        self.images = {}  # имя файла -> поверхность
+        self.frames = {}  # (кнопка, номер кадра) -> поверхность
+        self.hits = 0  # сколько раз картинка нашлась в кэше
+        self.misses = 0  # сколько раз пришлось читать файл
+
+    def _load_file(self, name):
+        image = pygame.image.load(os.path.join(self.path, name))
+        if pygame.display.get_surface() is not None:
+            # convert_alpha работает только после set_mode
+            image = image.convert_alpha()
+        self.images[name] = image
+        return image
+
+    def load(self):
+        # загружаем сразу все картинки и собираем таблицу кадров,
+        # вызывается один раз при старте после создания окна
+        for name in sorted(os.listdir(self.path)):
+            if name.endswith('.png') and name not in self.images:
+                self._load_file(name)
+        for key, names in PACMAN_FRAMES.items():
+            for i, name in enumerate(names):
+                self.frames[(key, i)] = self.images[name]
+
+    def image(self, name):
+        if name in self.images:
+            self.hits += 1
+            return self.images[name]
+        self.misses += 1
+        return self._load_file(name)
+
+    def frame(self, key, index):
+        # кадр анимации пакмана для направления key
+        if (key, index) in self.frames:
+            self.hits += 1
+            return self.frames[(key, index)]
+        image = self.image(PACMAN_FRAMES[key][index])
+        self.frames[(key, index)] = image
+        return image
+
+    def stats(self):
+        return {'images': len(self.images), 'hits': self.hits, 'misses': self.misses}
+
+
+assets = Assets()  # общий кэш для всей игры
@@ -0,0 +1,174 @@
+import numpy as np
+
+from flowfield import flow_field
+from level import default_level
+from simulation import chasing
+
+KEY_CODES = (0, 97, 115, 100, 119)  # номер направления -> код кнопки, 0 - нет хода
+STEP_X = np.array([0, -1, 0, 1, 0])
+STEP_Y = np.array([0, 0, 1, 0, -1])
+# сдвиг на пиксель для направлений A, S, D, W
+GHOST_DIRS = {'a': 1, 's': 2, 'd': 3, 'w': 4}  # буква хода привидения -> номер направления
+
+
+class BatchSimulation:
+    # n независимых партий в массивах numpy, все делают тик за один вызов step;
+    # правила те же, что в Simulation, но случайные ходы привидений
+    # берутся из общего генератора numpy, поэтому партии не совпадают с Simulation по сидам
+    def __init__(self, n, level=None, seed=None):
+        level = level if level is not None else default_level()
+        self.n = n
+        self.cell_size = level.cell_size
+        self.rng = np.random.default_rng(seed)
+        self.height = level.height
+        self.width = level.width
+
+        self.walk = np.frombuffer(level.walkable, dtype=np.uint8).astype(bool)  # клетки, куда может пройти пакман
+        sets = np.zeros((len(level.move_sets), 4), dtype=np.int64)
+        for i, moves in enumerate(level.move_sets):
+            sets[i, :len(moves)] = [GHOST_DIRS[move] for move in moves]
+        junctions = np.frombuffer(level.junctions, dtype=np.uint8)
+        self.move_count = np.array([len(moves) for moves in level.move_sets], dtype=np.int64)[junctions]
+        self.move_table = sets[junctions]
+        # ходы привидений из узлов в том же порядке, что и в уровне
+        pacman = level.pacman_start
+        ghosts = level.ghost_starts
+        self.flow = flow_field(level)
+        self.rank = np.zeros(len(level.cells), dtype=np.int64)
+        self.rank[list(self.flow.nodes)] = np.arange(1, len(self.flow.nodes) + 1)
+        # клетка -> столбец узла в chase_rows, 0 - не узел
+        self.chase_slot = np.full(len(level.cells), -1, dtype=np.int64)  # клетка пакмана -> строка chase_rows
+        self.chase_rows = np.zeros((16, len(self.flow.nodes) + 1), dtype=np.uint8)
+        self.chase_count = 0
+        # строка, столбец узла -> направление погони, как у Simulation; строка для клетки пакмана
+        # добавляется, когда пакман в первый раз в нее попадает во время погони
+
+        self.key_index = np.zeros(128, dtype=np.int64)
+        for i, code in enumerate(KEY_CODES):
+            self.key_index[code] = i
+
+        self.pacman = np.tile(np.array(pacman, dtype=np.int64), (n, 1))  # (n, 2) позиции в пикселях
+        self.currentkey = np.zeros(n, dtype=np.int64)  # принятый ход пакмана
+        self.key = np.zeros(n, dtype=np.int64)  # последняя нажатая кнопка
+        self.ghosts = np.tile(np.array(ghosts, dtype=np.int64), (n, 1, 1))  # (n, привидения, 2)
+        self.ghost_dirs = np.zeros((n, len(ghosts)), dtype=np.int64)
+
+        self.dots = np.tile(np.frombuffer(level.dots, dtype=np.uint8).astype(bool), (n, 1))
+        # (n, клетки) маска оставшихся точек
+        self.remaining = np.full(n, level.dot_count, dtype=np.int64)  # партия выиграна, когда точек не осталось
+        self.score = np.zeros(n, dtype=np.int64)
+        self.ticks = np.zeros(n, dtype=np.int64)
+        self.alive = np.ones(n, dtype=bool)  # партия еще идет
+        self.won = np.zeros(n, dtype=bool)
+        self._rows = np.arange(n)
+        self.ghost_calc(self.alive)
+
+    def press(self, keys):
+        # keys - коды кнопок для каждой партии, 0 - кнопка не нажата
+        keys = self.key_index[np.asarray(keys)]
+        pressed = self.alive & (keys > 0)
+        self.key = np.where(pressed, keys, self.key)
+        self.pacman_movement(keys, pressed)
+
+    def step(self, keys=None):
+        # один тик во всех незаконченных партиях
+        if keys is not None:
+            self.press(keys)
+        active = self.alive.copy()
+        pos = self.pacman.copy()
+        self.ghost_calc(active)
+        self.eat(pos, active)
+        self.pacman_movement(self.key, active)
+        lost = self.collide(pos)
+        won = self.remaining == 0
+        self.ticks += active
+        self.won |= active & won
+        self.alive &= ~(lost | won)
+        return self.alive
+
+    def pacman_movement(self, keys, mask):
+        size = self.cell_size
+        cx = self.pacman[:, 0]
+        cy = self.pacman[:, 1]
+        horizontal = (keys == 1) | (keys == 3)
+        vertical = (keys == 2) | (keys == 4)
+        check = (horizontal & (cy % size == 0)) | (vertical & (cx % size == 0))
+        # на клетке проверяем соседнюю клетку в сторону новой кнопки
+        px = cx + np.where(STEP_X[keys] > 0, size + 1, STEP_X[keys])
+        py = cy + np.where(STEP_Y[keys] > 0, size + 1, STEP_Y[keys])
+        allowed = check & self.walk[(py // size) * self.width + px // size]
+        self.currentkey = np.where(mask & allowed, keys, self.currentkey)
+        move = np.where(check, np.where(allowed, keys, 0), self.currentkey)
+        self.pacman_move(move, mask)
+
+    def pacman_move(self, keys, mask):
+        size = self.cell_size
+        x = self.pacman[:, 0] + STEP_X[keys]
+        y = self.pacman[:, 1] + STEP_Y[keys]
+        ok = mask & (keys > 0) & self.walk[(y // size) * self.width + x // size]
+        self.pacman[:, 0] = np.where(ok, x, self.pacman[:, 0])
+        self.pacman[:, 1] = np.where(ok, y, self.pacman[:, 1])
+
+    def ghost_calc(self, mask):
+        size = self.cell_size
+        gx = self.ghosts[:, :, 0]
+        gy = self.ghosts[:, :, 1]
+        cell = (gy // size) * self.width + gx // size
+        count = np.where((gx % size == 0) & (gy % size == 0), self.move_count[cell], 0)
+        choice = (self.rng.random(count.shape) * count).astype(np.int64)
+        picked = self.move_table[cell, np.minimum(choice, 3)]
+        half = size // 2
+        target = ((self.pacman[:, 1] + half) // size) * self.width + (self.pacman[:, 0] + half) // size
+        chase = chasing(self.ticks)
+        if chase.any():
+            # партиям в разброде достается строка любой партии в погоне, их выбор все равно не берется
+            slots = self.chase_rows_for(np.where(chase, target, target[chase][0]))
+            picked = np.where(chase[:, None], self.chase_rows[slots[:, None], self.rank[cell]], picked)
+        self.ghost_dirs = np.where(mask[:, None] & (count > 0), picked, self.ghost_dirs)
+        moving = mask[:, None]
+        self.ghosts[:, :, 0] += np.where(moving, STEP_X[self.ghost_dirs], 0)
+        self.ghosts[:, :, 1] += np.where(moving, STEP_Y[self.ghost_dirs], 0)
+
+    def chase_rows_for(self, targets):
+        # строки chase_rows для клеток пакмана, недостающие строки берутся из общего поля
+        for target in np.unique(targets[self.chase_slot[targets] < 0]):
+            if self.chase_count == len(self.chase_rows):
+                self.chase_rows = np.concatenate([self.chase_rows, np.zeros_like(self.chase_rows)])
+            route = self.flow.route(target)
+            self.chase_rows[self.chase_count, 1:] = [GHOST_DIRS[route[node]] for node in self.flow.nodes]
+            self.chase_slot[target] = self.chase_count
+            self.chase_count += 1
+        return self.chase_slot[targets]
+
+    def eat(self, pos, mask):
+        # клетки, которых касается пакман: от 1 до 4 штук
+        size = self.cell_size
+        x0 = pos[:, 0] // size
+        y0 = pos[:, 1] // size
+        x1 = (pos[:, 0] + size - 1) // size
+        y1 = (pos[:, 1] + size - 1) // size
+        cells = np.stack([y0 * self.width + x0, y0 * self.width + x1,
+                          y1 * self.width + x0, y1 * self.width + x1], axis=1)
+        touched = self.dots[self._rows[:, None], cells] & mask[:, None]
+        ate = touched.any(axis=1)
+        self.score += ate
+        self.dots[self._rows[:, None], cells] &= ~touched
+        self.remaining[ate] = self.dots[ate].sum(axis=1)  # клетки в cells могут повторяться, поэтому пересчет
+
+    def collide(self, pos):
+        size = self.cell_size
+        diff = np.abs(self.ghosts - pos[:, None, :])
+        return ((diff[:, :, 0] < size) & (diff[:, :, 1] < size)).any(axis=1)
+
+    def run(self, keys=None, max_ticks=100000):
+        # крутим тики, пока не закончатся все партии; keys(tick) -> коды кнопок или None
+        tick = 0
+        while self.alive.any() and tick < max_ticks:
+            self.step(None if keys is None else keys(tick))
+            tick += 1
+        return self.summary()
+
+    def summary(self):
+        return {'games': self.n, 'wins': int(self.won.sum()),
+                'losses': int((~self.alive & ~self.won).sum()),
+                'score': self.score * 10, 'ticks': self.ticks}
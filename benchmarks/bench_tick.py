@@ -0,0 +1,194 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')  # без окна, работает и на сервере
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # картинки грузятся по пути data/
+
+import pygame  # noqa: E402
+
+import pacman  # noqa: E402
+from level import default_level, ghost_count  # noqa: E402
+from render import FrameStats, frame  # noqa: E402
+from replay import Player, Replay  # noqa: E402
+from simulation import Simulation  # noqa: E402
+from tournament import random_agent  # noqa: E402
+
+
+class Phases:
+    # время каждой фазы тика по вызовам
+    def __init__(self):
+        self.samples = {}
+
+    def wrap(self, name, func):
+        samples = self.samples.setdefault(name, [])
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            samples.append((time.perf_counter() - start) * 1000)
+            return result
+        return timed
+
+    def report(self):
+        return {name: {'calls': len(values),
+                       'total_ms': sum(values),
+                       'p50_ms': FrameStats.percentile(values, 50),
+                       'p99_ms': FrameStats.percentile(values, 99)}
+                for name, values in self.samples.items()}
+
+
+def new_game(screen, seed, phases, player=None, ghosts=None):
+    # игра с теми же классами, что и в pacman.py, фазы обернуты замером времени
+    world = Simulation(ghosts=default_level().roster(ghosts), seed=seed)
+    game = pacman.Game(screen, world, player=player)
+    game.start()
+    world.ghost_calc = phases.wrap('ghost_calc', world.ghost_calc)
+    world.eat = phases.wrap('dots_update', world.eat)
+    world.pacman_movement = phases.wrap('pacman_movement', world.pacman_movement)
+    world.collide = phases.wrap('collide', world.collide)
+    game.dots.draw = phases.wrap('update_dots', game.dots.draw)
+    game.pacman.draw = phases.wrap('pacman_draw', game.pacman.draw)
+    game.ghosts.draw = phases.wrap('ghosts_draw', game.ghosts.draw)
+    return game
+
+
+def bench_game(ticks, seed, replay=None, ghosts=None):
+    # полный тик игры с отрисовкой: логика, рисование и вывод на экран;
+    # с записью партии нажатия берутся из нее и замер идет до конца записи
+    screen = pygame.display.set_mode(pacman.window_size(default_level()))
+    pacman.assets.load()
+    phases = Phases()
+    present = phases.wrap('present', frame.present)
+    tick_ms = []
+    games = 0
+    rng = random.Random(seed)
+    game = None
+    if replay is not None:
+        replay.check_level(default_level())
+        game = new_game(screen, replay.seed, phases, Player(replay, replay.end_tick), replay.ghosts)
+        games = 1
+    while not game.over() if replay is not None else len(tick_ms) < ticks:
+        if replay is None and (game is None or game.world.result is not None):
+            game = new_game(screen, seed + games, phases, ghosts=ghosts)
+            games += 1
+        start = time.perf_counter()
+        if replay is None:
+            key = random_agent(game.world, rng)
+            if key is not None:
+                game.press(key)
+        game.update(game.step_ms)  # ровно один тик
+        game.draw()
+        present()
+        tick_ms.append((time.perf_counter() - start) * 1000)
+    ticks = len(tick_ms)
+    total = sum(tick_ms) / 1000
+    return {'ticks': ticks, 'games': games, 'ticks_per_sec': ticks / total if total else 0.0,
+            'tick_p50_ms': FrameStats.percentile(tick_ms, 50),
+            'tick_p99_ms': FrameStats.percentile(tick_ms, 99),
+            'phases': phases.report(), 'assets': pacman.assets.stats()}
+
+
+def bench_simulation(ticks, seed, ghosts=None):
+    # только логика, без pygame
+    done = 0
+    games = 0
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    while done < ticks:
+        sim = Simulation(ghosts=default_level().roster(ghosts), seed=seed + games)
+        games += 1
+        while sim.result is None and done < ticks:
+            key = random_agent(sim, rng)
+            if key is not None:
+                sim.press(key)
+            sim.step()
+            done += 1
+    elapsed = time.perf_counter() - start
+    return {'ticks': done, 'games': games, 'ticks_per_sec': done / elapsed if elapsed else 0.0}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=ROOT).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(report, baseline):
+    # во сколько раз изменилось время по сравнению с прошлым отчетом
+    print(f"{'phase':<16}{'base p50':>10}{'now p50':>10}{'ratio':>8}")
+    for name, now in report['game']['phases'].items():
+        base = baseline.get('game', {}).get('phases', {}).get(name)
+        if base and base['p50_ms']:
+            print(f"{name:<16}{base['p50_ms']:>10.4f}{now['p50_ms']:>10.4f}{now['p50_ms'] / base['p50_ms']:>8.2f}")
+    for part in ('game', 'simulation'):
+        base = baseline.get(part, {}).get('ticks_per_sec')
+        if base:
+            print(f"{part} ticks/sec: {base:.0f} -> {report[part]['ticks_per_sec']:.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Замер времени фаз тика без окна')
+    parser.add_argument('--ticks', type=int, default=5000, help='сколько тиков мерить')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='куда сохранить отчет')
+    parser.add_argument('--ghosts', type=ghost_count, help='число привидений для нагрузочного замера')
+    parser.add_argument('--replay', help='запись партии (см. replay.py) вместо случайного агента')
+    parser.add_argument('--compare', help='отчет прошлого коммита для сравнения')
+    parser.add_argument('--profile', choices=('cprofile', 'pyinstrument'),
+                        help='снять профиль игрового замера')
+    parser.add_argument('--profile-out', default='bench_tick.prof', help='файл профиля')
+    args = parser.parse_args(argv)
+
+    profiler = None
+    if args.profile == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif args.profile == 'pyinstrument':
+        import pyinstrument  # нужен отдельно: pip install pyinstrument
+        profiler = pyinstrument.Profiler()
+        profiler.start()
+
+    replay = Replay(args.replay) if args.replay else None
+    game = bench_game(args.ticks, args.seed, replay, args.ghosts)
+    if replay is not None:
+        replay.close()
+
+    if args.profile == 'cprofile':
+        profiler.disable()
+        profiler.dump_stats(args.profile_out)
+    elif args.profile == 'pyinstrument':
+        profiler.stop()
+        with open(args.profile_out, 'w') as f:
+            f.write(profiler.output_html())
+
+    report = {'commit': git_commit(), 'seed': args.seed, 'replay': args.replay, 'ghosts': args.ghosts,
+              'game': game, 'simulation': bench_simulation(args.ticks * 10, args.seed, args.ghosts)}
+    pygame.quit()
+
+    print(f"game: {game['ticks_per_sec']:.0f} ticks/sec, tick p50 {game['tick_p50_ms']:.3f} ms, "
+          f"p99 {game['tick_p99_ms']:.3f} ms")
+    for name, phase in game['phases'].items():
+        print(f"  {name:<16} p50 {phase['p50_ms']:.4f} ms  p99 {phase['p99_ms']:.4f} ms  calls {phase['calls']}")
+    print(f"simulation: {report['simulation']['ticks_per_sec']:.0f} ticks/sec")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from level import WALL, default_level, ghost_count, load_level
+from simulation import KEY_STEPS, Simulation
+
+ACTIONS = (0,) + tuple(KEY_STEPS)  # номер действия -> код кнопки, 0 - ничего не нажимать
+CHANNELS = ('walls', 'dots', 'ghosts', 'pacman')
+# каналы наблюдения, каждый - поле height x width: стены, точки, сколько привидений в клетке, пакман;
+# число привидений в клетке насыщается на 255, больше uint8 не вмещает
+
+
+class PacmanEnv:
+    # одна партия с интерфейсом reset(seed) / step(action) поверх Simulation;
+    # наблюдение - один и тот же массив uint8 (каналы, высота, ширина), step переписывает его на месте
+    def __init__(self, level=None, ghosts=None, max_ticks=20000, frame_skip=1, observation=None):
+        self.level = level if level is not None else default_level()
+        self.ghosts = ghosts  # число привидений для Level.roster, None - сколько на уровне
+        self.max_ticks = max_ticks
+        self.frame_skip = frame_skip  # тиков на одно действие
+        shape = (len(CHANNELS), self.level.height, self.level.width)
+        self.observation = observation if observation is not None else np.zeros(shape, dtype=np.uint8)
+        self.walls = (np.frombuffer(self.level.cells, dtype=np.uint8) == WALL).reshape(shape[1:])
+        self.sim = None
+        self.dots = None  # вид на state.dots без копии
+
+    def reset(self, seed=None):
+        level = self.level
+        self.sim = Simulation(level, ghosts=level.roster(self.ghosts), seed=seed)
+        self.dots = np.frombuffer(self.sim.state.dots, dtype=np.uint8).reshape(level.height, level.width)
+        self.observation[0] = self.walls
+        self.observe()
+        return self.observation, {}
+
+    def step(self, action):
+        # действие держится frame_skip тиков; награда - очки за эти тики
+        sim = self.sim
+        state = sim.state
+        key = ACTIONS[action]
+        if key and key != state.pacman.key:
+            sim.press(key)  # нажатие сдвигает пакмана, поэтому ту же кнопку повторно не жмем
+        score = state.score
+        for _ in range(self.frame_skip):
+            if state.result is not None or state.tick >= self.max_ticks:
+                break
+            sim.step()
+        self.observe()
+        terminated = state.result is not None
+        truncated = not terminated and state.tick >= self.max_ticks
+        return self.observation, (state.score - score) * 10, terminated, truncated, {}
+
+    def observe(self):
+        state = self.sim.state
+        size = state.board.cell_size
+        half = size // 2
+        observation = self.observation
+        observation[1] = self.dots
+        width = state.board.width
+        cells = [(g.y + half) // size * width + (g.x + half) // size for g in state.ghosts]  # клетки центров
+        counts = np.bincount(cells, minlength=observation[2].size).reshape(observation[2].shape)
+        np.minimum(counts, 255, out=observation[2], casting='unsafe')  # += в uint8 переполнялся бы
+        pacman = observation[3]
+        pacman.fill(0)
+        pacman[(state.pacman.y + half) // size, (state.pacman.x + half) // size] = 1
+
+    def summary(self):
+        return self.sim.summary()
+
+
+def _worker(pipe, names, n, first, count, level, ghosts, max_ticks, frame_skip):
+    # процесс с партиями first .. first + count - 1, все массивы общие с родителем
+    blocks = [shared_memory.SharedMemory(name=name) for name in names]
+    observations, actions, rewards, terminated, truncated, finals = _views(blocks, n, level)
+    envs = [PacmanEnv(level, ghosts, max_ticks, frame_skip, observations[first + i]) for i in range(count)]
+    episodes = [0] * count
+    seed = 0
+    try:
+        while True:
+            command, value = pipe.recv()
+            if command == 'reset':
+                seed = value
+                for i, env in enumerate(envs):
+                    episodes[i] = 0
+                    env.reset(seed + first + i)
+            elif command == 'step':
+                results = []
+                for i, env in enumerate(envs):
+                    j = first + i
+                    _, rewards[j], terminated[j], truncated[j], _ = env.step(actions[j])
+                    if terminated[j] or truncated[j]:
+                        finals[j] = observations[j]  # последнее наблюдение партии, reset его перепишет
+                        results.append((j, env.summary()))
+                        episodes[i] += 1
+                        env.reset(seed + j + episodes[i] * n)  # новая партия сразу, как в векторных gym
+                pipe.send(results)
+                continue
+            elif command == 'close':
+                break
+            pipe.send(None)
+    finally:
+        del observations, actions, rewards, terminated, truncated, finals
+        for block in blocks:
+            block.close()
+
+
+def _views(blocks, n, level):
+    # массивы numpy поверх общих блоков памяти, одинаковые в родителе и в процессах
+    shape = (n, len(CHANNELS), level.height, level.width)
+    return (np.ndarray(shape, dtype=np.uint8, buffer=blocks[0].buf),
+            np.ndarray(n, dtype=np.int64, buffer=blocks[1].buf),
+            np.ndarray(n, dtype=np.int64, buffer=blocks[2].buf),
+            np.ndarray(n, dtype=bool, buffer=blocks[3].buf),
+            np.ndarray(n, dtype=bool, buffer=blocks[4].buf),
+            np.ndarray(shape, dtype=np.uint8, buffer=blocks[5].buf))
+
+
+class VectorEnv:
+    # n партий в нескольких процессах; наблюдения, действия и награды лежат в общей памяти,
+    # между процессами по pipe ходят только команды; закончившаяся партия сразу начинается заново
+    def __init__(self, n, level=None, ghosts=None, max_ticks=20000, frame_skip=1, workers=None):
+        self.level = level if level is not None else default_level()
+        self.n = n
+        workers = min(workers or os.cpu_count() or 1, n)
+        cells = n * len(CHANNELS) * self.level.height * self.level.width
+        sizes = (cells, n * 8, n * 8, n, n, cells)
+        self.blocks = [shared_memory.SharedMemory(create=True, size=size) for size in sizes]
+        (self.observations, self.actions, self.rewards, self.terminated, self.truncated,
+         self.final_observations) = _views(self.blocks, n, self.level)
+        # final_observations[i] - последнее наблюдение партии i, годится только там, где terminated или truncated
+        self.actions[:] = 0
+        names = [block.name for block in self.blocks]
+        self.pipes = []
+        self.processes = []
+        for w in range(workers):
+            first = n * w // workers
+            count = n * (w + 1) // workers - first
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_worker, daemon=True,
+                                              args=(child, names, n, first, count, self.level, ghosts,
+                                                    max_ticks, frame_skip))
+            process.start()
+            child.close()
+            self.pipes.append(parent)
+            self.processes.append(process)
+
+    def reset(self, seed=0):
+        # партия i начинается с seed + i, ее следующие партии - с seed + i + n, seed + i + 2n, ...
+        for pipe in self.pipes:
+            pipe.send(('reset', seed))
+        for pipe in self.pipes:
+            pipe.recv()
+        return self.observations, {}
+
+    def step(self, actions):
+        # actions - номера действий из ACTIONS для каждой партии; возвращаются все те же массивы,
+        # в info['episodes'] - итоги партий, закончившихся на этом шаге, в info['final_observation'] -
+        # их последние наблюдения (observations там уже от новой партии)
+        self.actions[:] = actions
+        for pipe in self.pipes:
+            pipe.send(('step', None))
+        episodes = []
+        for pipe in self.pipes:
+            episodes.extend(pipe.recv())
+        info = {'episodes': episodes, 'final_observation': self.final_observations}
+        return self.observations, self.rewards, self.terminated, self.truncated, info
+
+    def close(self):
+        if not self.pipes:
+            return
+        for pipe in self.pipes:
+            pipe.send(('close', None))
+        for process in self.processes:
+            process.join()
+        self.pipes = []
+        del self.observations, self.actions, self.rewards, self.terminated, self.truncated, self.final_observations
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Скорость среды для обучения: шагов в секунду со случайными действиями')
+    parser.add_argument('--envs', type=int, default=16, help='партий в VectorEnv')
+    parser.add_argument('--workers', type=int, default=None, help='число процессов, по умолчанию все ядра')
+    parser.add_argument('--steps', type=int, default=2000, help='шагов каждой партии')
+    parser.add_argument('--frame-skip', type=int, default=1)
+    parser.add_argument('--ghosts', type=ghost_count, help='число привидений, места уровня повторяются по кругу')
+    parser.add_argument('--level', help='файл уровня, по умолчанию levels/classic.txt')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    try:
+        level = load_level(args.level) if args.level else default_level()
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    rng = np.random.default_rng(args.seed)
+    actions = rng.integers(0, len(ACTIONS), size=(args.steps, args.envs))  # заранее, чтобы мерить только среду
+
+    env = PacmanEnv(level, args.ghosts, frame_skip=args.frame_skip)
+    env.reset(args.seed)
+    start = time.perf_counter()
+    for action in actions[:, 0]:
+        _, _, terminated, truncated, _ = env.step(action)
+        if terminated or truncated:
+            env.reset()
+    single = args.steps / (time.perf_counter() - start)
+
+    episodes = 0
+    with VectorEnv(args.envs, level, args.ghosts, frame_skip=args.frame_skip, workers=args.workers) as vector:
+        vector.reset(args.seed)
+        start = time.perf_counter()
+        for step in actions:
+            episodes += len(vector.step(step)[4]['episodes'])
+        vector_rate = args.steps * args.envs / (time.perf_counter() - start)
+
+    report = {'env_steps_per_sec': single, 'vector_steps_per_sec': vector_rate, 'envs': args.envs,
+              'episodes': episodes}
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == '__main__':
+    main()
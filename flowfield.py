@@ -0,0 +1,98 @@
+import functools
+import heapq
+
+from maze import MOVES
+
+UNREACHABLE = 0xFFFF  # из узла до цели не дойти
+
+
+class FlowField:
+    # пути привидений к клетке пакмана по графу узлов уровня: привидение сворачивает только в узлах
+    # и не разворачивается в коридоре, поэтому расстояние считается по ребрам графа, а не по клеткам;
+    # поле для клетки считается один раз и дальше общее для всех привидений и всех партий на этом уровне,
+    # привидение выбирает ход одним чтением из списка
+    def __init__(self, level):
+        self.width = level.width
+        self.cell_size = level.cell_size
+        self.junctions = level.junctions
+        self.nodes = tuple(sorted(cy * level.width + cx for cy, cx in level.graph.moves))
+        # клетки узлов по порядку, номер в этом кортеже - ранг узла
+        self.edges = {}  # клетка узла -> ((ход, длина, клетка следующего узла), ...) в порядке ходов
+        self.incoming = {node: [] for node in self.nodes}  # клетка узла -> [(откуда, длина), ...]
+        self.passing = {}  # клетка внутри коридора -> [(клетка узла, ход, шагов от узла), ...]
+        for node in self.nodes:
+            cy, cx = divmod(node, level.width)
+            edges = []
+            for move in level.graph.moves[(cy, cx)]:
+                (ny, nx), length = level.graph.next_node(cy, cx, move)
+                dx, dy = MOVES[move]
+                step = dy * level.width + dx
+                end = ny * level.width + nx
+                while not self.junctions[end]:
+                    end += step  # ребро кончается на стенке выхода, привидение проходит ее насквозь
+                    length += 1
+                for i in range(1, length):
+                    self.passing.setdefault(node + i * step, []).append((node, move, i))
+                edges.append((move, length, end))
+                self.incoming[end].append((node, length))
+            self.edges[node] = tuple(edges)
+        self.fields = {}  # клетка цели -> (расстояния, ходы)
+
+    def target(self, x, y):
+        # клетка, в которой центр тела с левым верхним углом в пикселе (x, y)
+        half = self.cell_size // 2
+        return (y + half) // self.cell_size * self.width + (x + half) // self.cell_size
+
+    def distances(self, target):
+        # словарь: клетка узла -> шагов привидения из этого узла до target; узлов, откуда до target не дойти, в нем нет
+        return self._field(target)[0]
+
+    def route(self, target):
+        # список: клетка узла -> ход привидения к target, '' вне узлов
+        return self._field(target)[1]
+
+    def _field(self, target):
+        field = self.fields.get(target)
+        if field is None:
+            field = self.fields[target] = self._search(target)
+        return field
+
+    def _search(self, target):
+        # Дейкстра от цели назад по ребрам; цель внутри коридора - это два его конца,
+        # от узла-начала до нее столько шагов, сколько клеток до нее в коридоре
+        direct = {}  # клетка узла -> {ход: шагов до цели внутри ребра}
+        distances = {}
+        queue = []
+        if self.junctions[target]:
+            queue.append((0, target))
+        for node, move, i in self.passing.get(target, ()):
+            direct.setdefault(node, {})[move] = i
+            queue.append((i, node))
+        heapq.heapify(queue)
+        while queue:
+            distance, node = heapq.heappop(queue)
+            if node in distances:
+                continue
+            distances[node] = distance
+            for source, length in self.incoming[node]:
+                if source not in distances:
+                    heapq.heappush(queue, (distance + length, source))
+
+        route = [''] * len(self.junctions)
+        for node, edges in self.edges.items():
+            near = direct.get(node, {})
+
+            def cost(edge):
+                move, length, end = edge
+                return near.get(move, length + distances.get(end, UNREACHABLE))
+
+            # при равных расстояниях берется первый ход, порядок как в JunctionGraph;
+            # если до цели не дойти, привидение идет первым ходом узла
+            route[node] = min(edges, key=cost)[0]
+        return distances, route
+
+
+@functools.lru_cache(maxsize=None)
+def flow_field(level):
+    # одно поле на уровень, его кэш целей растет не больше числа клеток поля
+    return FlowField(level)
@@ -0,0 +1,81 @@
+import pygame
+
+from render import frame
+
+SCORE_COLOR = (255, 255, 0)
+MESSAGE_COLOR = (232, 72, 167)
+
+_fonts = {}  # размер -> шрифт, каждый шрифт создается один раз
+
+
+def font(size):
+    # подсистема шрифтов запускается при первом шрифте, а не при импорте игры
+    if size not in _fonts:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        _fonts[size] = pygame.font.Font(None, size)
+    return _fonts[size]
+
+
+class Text:
+    # кэш отрисованных строк и отдельных символов одного шрифта и цвета
+    def __init__(self, size, color):
+        self.font = font(size)
+        self.color = color
+        self.lines = {}  # строка целиком -> поверхность, для надписей, которые не меняются
+        self.glyphs = {}  # символ -> поверхность, для чисел
+
+    def line(self, text):
+        if text not in self.lines:
+            self.lines[text] = self.font.render(text, True, self.color)
+        return self.lines[text]
+
+    def glyph(self, char):
+        if char not in self.glyphs:
+            self.glyphs[char] = self.font.render(char, True, self.color)
+        return self.glyphs[char]
+
+    def parts(self, label, value):
+        # надпись из готовой подписи и цифр числа, без растеризации шрифта
+        parts = [self.line(label)] + [self.glyph(char) for char in str(value)]
+        return parts, pygame.Rect(0, 0, sum(part.get_width() for part in parts), self.font.get_height())
+
+    def blit(self, screen, parts, place):
+        x = place[0]
+        for part in parts:
+            screen.blit(part, (x, place[1]))
+            x += part.get_width()
+
+
+class Hud:
+    # все надписи игры: очки, сообщения о конце игры и мелкий текст оверлея
+    def __init__(self, screen, score_center=(525, 20), message_center=(237, 275)):
+        self.screen = screen
+        self.score_center = score_center
+        self.message_center = message_center
+        self.score_text = Text(25, SCORE_COLOR)
+        self.message_text = Text(50, MESSAGE_COLOR)
+        self.small = Text(18, (200, 200, 200))
+        self.shown_score = None  # очки, которые сейчас на экране
+        self.score_place = None  # где они нарисованы
+
+    def score(self, score):
+        # очки перерисовываются только когда меняются
+        if score == self.shown_score:
+            return
+        parts, place = self.score_text.parts('score ', score)
+        place.center = self.score_center
+        if self.score_place is not None:
+            frame.restore(self.score_place)
+        frame.restore(place)
+        self.score_text.blit(self.screen, parts, place)
+        self.shown_score = score
+        self.score_place = place
+
+    def message(self, line):
+        # надпись посередине поля на черной подложке
+        text = self.message_text.line(line)
+        place = text.get_rect(center=self.message_center)
+        pygame.draw.rect(self.screen, (0, 0, 0), place, 0)
+        self.screen.blit(text, place)
+        frame.mark(place)
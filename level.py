@@ -0,0 +1,285 @@
+import functools
+import hashlib
+import json
+import os
+
+from maze import CELL_SIZE, MOVES, JunctionGraph
+
+LEVELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'levels')
+CLASSIC = os.path.join(LEVELS_DIR, 'classic.txt')  # уровень из курса
+CACHE_DIR = '.levelcache'  # папка рядом с файлом уровня для собранных таблиц
+COMPILER_VERSION = 4  # меняется вместе с форматом таблиц, старый кэш тогда не читается
+
+WALL = 1
+GHOST_DOOR = 2
+NODE = 3
+HOUSE_NODE = 4
+# значения клеток, 0 - проход с точкой
+
+GHOST_KINDS = ('cian', 'red', 'yellow', 'pink')
+# виды привидений, картинка вида - ghost<вид>.png; привидения без вида получают их по кругу
+MAX_GHOSTS = 0xFFFF  # число привидений в записи партии и в протоколе сервера - uint16
+
+
+class LevelError(ValueError):
+    pass
+
+
+class Level:
+    # собранный уровень: все таблицы плоские, клетка (x, y) - индекс y * width + x
+    __slots__ = ('name', 'digest', 'width', 'height', 'cell_size', 'cells', 'walkable', 'junctions',
+                 'move_sets', 'dots', 'dot_count', 'pacman_start', 'ghost_starts', 'ghost_kinds', 'graph')
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, y):
+        # строка поля без копирования, чтобы работало level[y][x]
+        return memoryview(self.cells)[y * self.width:(y + 1) * self.width]
+
+    def cell(self, x, y):
+        return self.cells[y * self.width + x]
+
+    def ghost_moves(self, cy, cx):
+        # допустимые ходы привидения в узле, пустой кортеж вне узлов
+        return self.move_sets[self.junctions[cy * self.width + cx]]
+
+    def roster(self, count=None):
+        # привидения партии: пары (позиция, вид); если count больше мест на уровне,
+        # места и виды повторяются по кругу
+        total = len(self.ghost_starts)
+        count = total if count is None else ghost_count(count)
+        return [(self.ghost_starts[i % total], self.ghost_kinds[i % total]) for i in range(count)]
+
+
+def ghost_count(value):
+    # число привидений от 1 до MAX_GHOSTS; годится и как type для argparse
+    count = int(value)
+    if not 1 <= count <= MAX_GHOSTS:
+        raise ValueError(f'число привидений должно быть от 1 до {MAX_GHOSTS}, а не {count}')
+    return count
+
+
+def parse_text(text, source='<text>'):
+    # строки "cell N", "pacman x y", "ghost x y [вид]", "scan N", затем сетка из цифр; # - комментарий
+    cell_size = CELL_SIZE
+    pacman = None
+    scan = None
+    ghosts = []
+    rows = []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        if line.isdigit():
+            rows.append([int(char) for char in line])
+            continue
+        if rows:
+            raise LevelError(f'{source}:{number}: после сетки не должно быть настроек')
+        name, *values = line.split()
+        kind = None
+        if name == 'ghost' and len(values) == 3:
+            kind = values.pop()
+        try:
+            values = [int(value) for value in values]
+        except ValueError:
+            raise LevelError(f'{source}:{number}: ожидались целые числа') from None
+        if name == 'cell' and len(values) == 1:
+            cell_size = values[0]
+        elif name == 'pacman' and len(values) == 2:
+            pacman = tuple(values)
+        elif name == 'ghost' and len(values) == 2:
+            ghosts.append((values[0], values[1], kind))
+        elif name == 'scan' and len(values) == 1:
+            scan = values[0]
+        else:
+            raise LevelError(f'{source}:{number}: непонятная строка {line!r}')
+    return rows, cell_size, pacman, ghosts, scan
+
+
+def parse_json(text, source='<json>'):
+    # {"cell_size": 25, "pacman": [x, y], "ghosts": [[x, y, "вид"], [x, y], ...], "scan": 9, "rows": ["1111", ...]}
+    try:
+        data = json.loads(text)
+        rows = [[int(char) for char in row] if isinstance(row, str) else list(row) for row in data['rows']]
+        pacman = tuple(data['pacman']) if data.get('pacman') is not None else None
+        ghosts = [(ghost[0], ghost[1], ghost[2] if len(ghost) > 2 else None) for ghost in data.get('ghosts', ())]
+        return rows, data.get('cell_size', CELL_SIZE), pacman, ghosts, data.get('scan')
+    except (ValueError, KeyError, TypeError) as error:
+        raise LevelError(f'{source}: {error}') from None
+
+
+def validate(rows, cell_size, pacman, ghosts, source='<level>', scan=None):
+    # проверка уровня; возвращает граф узлов привидений, чтобы не собирать его второй раз
+    if not isinstance(cell_size, int) or cell_size <= 0:
+        raise LevelError(f'{source}: размер клетки должен быть целым положительным')
+    if scan is not None and (not isinstance(scan, int) or scan < 2):
+        raise LevelError(f'{source}: глубина поиска узлов scan должна быть целой, не меньше 2')
+    if len(rows) < 3 or len(rows[0]) < 3:
+        raise LevelError(f'{source}: поле меньше 3 x 3')
+    width = len(rows[0])
+    for y, row in enumerate(rows):
+        if len(row) != width:
+            raise LevelError(f'{source}: в строке {y} сетки {len(row)} клеток, а не {width}')
+        for x, value in enumerate(row):
+            if not isinstance(value, int) or not 0 <= value <= HOUSE_NODE:
+                raise LevelError(f'{source}: непонятная клетка {value!r} в ({x}, {y})')
+            if (y in (0, len(rows) - 1) or x in (0, width - 1)) and value != WALL:
+                # по краю стена, тогда проверки соседних клеток не выходят за поле
+                raise LevelError(f'{source}: клетка ({x}, {y}) на краю поля не стена')
+    if pacman is None:
+        raise LevelError(f'{source}: не задана клетка пакмана')
+    x, y = pacman
+    if not (0 <= x < width and 0 <= y < len(rows)) or rows[y][x] not in (0, NODE):
+        raise LevelError(f'{source}: пакман в ({x}, {y}) стоит не на проходе')
+    if not ghosts:
+        raise LevelError(f'{source}: нет ни одного привидения')
+    for x, y, kind in ghosts:
+        if not (0 <= x < width and 0 <= y < len(rows)) or rows[y][x] not in (NODE, HOUSE_NODE):
+            raise LevelError(f'{source}: привидение в ({x}, {y}) стоит не в узле')
+        if kind is not None and kind not in GHOST_KINDS:
+            raise LevelError(f'{source}: неизвестный вид привидения {kind!r}, есть {", ".join(GHOST_KINDS)}')
+    if not any(value in (0, NODE) for row in rows for value in row):
+        raise LevelError(f'{source}: на поле нет точек')
+
+    graph = JunctionGraph(rows, scan)
+    for (cy, cx), moves in graph.moves.items():
+        # привидение меняет ход только в узлах, поэтому из каждого узла должен быть ход,
+        # и по каждому ходу оно должно дойти до следующего узла, а не до стены
+        if not moves:
+            raise LevelError(f'{source}: из узла ({cx}, {cy}) привидению некуда идти')
+        for move in moves:
+            dx, dy = MOVES[move]
+            x, y = cx + dx, cy + dy
+            while rows[y][x] not in (NODE, HOUSE_NODE):
+                if rows[y][x] == WALL:
+                    raise LevelError(f'{source}: ход {move!r} из узла ({cx}, {cy}) упирается в стену ({x}, {y})')
+                x, y = x + dx, y + dy
+    return graph
+
+
+def compile_level(rows, cell_size=CELL_SIZE, pacman=None, ghosts=(), name='level', source=None, scan=None):
+    # проверка и сборка таблиц; pacman - клетка (x, y), ghosts - клетки с видом (x, y, вид или None),
+    # scan - глубина поиска узлов из курса (см. JunctionGraph), None - коридоры до конца
+    ghosts = list(ghosts)
+    graph = validate(rows, cell_size, pacman, ghosts, source or name, scan)
+    level = Level()
+    level.name = name
+    level.width = len(rows[0])
+    level.height = len(rows)
+    level.cell_size = cell_size
+    level.cells = bytes(value for row in rows for value in row)
+    spawns = (cell_size, tuple(pacman), [(x, y) for x, y, _ in ghosts], scan)  # вид на правила не влияет
+    level.digest = hashlib.sha256(level.cells + repr(spawns).encode()).hexdigest()
+    # хэш самого уровня, а не файла: по нему записи партий узнают свой уровень
+    level.walkable = bytes(value != WALL and value != GHOST_DOOR for value in level.cells)
+    level.dots = bytes(value == 0 or value == NODE for value in level.cells)
+    level.dot_count = sum(level.dots)
+
+    move_sets = [()]  # 0 - не узел
+    junctions = bytearray(len(level.cells))
+    for (cy, cx), moves in graph.moves.items():
+        if moves not in move_sets:
+            move_sets.append(moves)
+        junctions[cy * level.width + cx] = move_sets.index(moves)
+    level.junctions = bytes(junctions)  # номер набора ходов в move_sets, порядок ходов как в JunctionGraph
+    level.move_sets = tuple(move_sets)
+    level.graph = graph  # ребра между узлами, для поиска путей
+
+    level.pacman_start = (pacman[0] * cell_size, pacman[1] * cell_size)  # в пикселях
+    level.ghost_starts = tuple((x * cell_size, y * cell_size) for x, y, _ in ghosts)
+    level.ghost_kinds = tuple(kind or GHOST_KINDS[i % len(GHOST_KINDS)] for i, (_, _, kind) in enumerate(ghosts))
+    return level
+
+
+def dump_cache(level):
+    # кэш без исполняемого кода: строка json с полями и графом, затем таблицы подряд как есть
+    graph = level.graph
+    header = {
+        'version': COMPILER_VERSION, 'name': level.name, 'digest': level.digest, 'width': level.width,
+        'height': level.height, 'cell_size': level.cell_size, 'move_sets': level.move_sets,
+        'dot_count': level.dot_count, 'pacman_start': level.pacman_start,
+        'ghost_starts': level.ghost_starts, 'ghost_kinds': level.ghost_kinds, 'scan_depth': graph.scan_depth,
+        'edges': [[cy, cx, ''.join(moves), [[move, *graph.edges[(cy, cx)][move]] for move in moves]]
+                  for (cy, cx), moves in graph.moves.items()],
+    }
+    return json.dumps(header).encode() + b'\n' + level.cells + level.walkable + level.junctions + level.dots
+
+
+def read_cache(data):
+    # уровень из dump_cache; ValueError, если данные не сходятся с форматом
+    line, _, tables = data.partition(b'\n')
+    header = json.loads(line)
+    if header['version'] != COMPILER_VERSION:
+        raise ValueError('кэш другой версии')
+    level = Level()
+    level.name = header['name']
+    level.digest = header['digest']
+    level.width = header['width']
+    level.height = header['height']
+    level.cell_size = header['cell_size']
+    size = level.width * level.height
+    if len(tables) != size * 4:
+        raise ValueError('таблицы не того размера')
+    level.cells, level.walkable, level.junctions, level.dots = (tables[i * size:(i + 1) * size] for i in range(4))
+    level.move_sets = tuple(tuple(moves) for moves in header['move_sets'])
+    if max(level.junctions) >= len(level.move_sets):
+        raise ValueError('номер набора ходов вне таблицы')
+    level.dot_count = header['dot_count']
+    level.pacman_start = tuple(header['pacman_start'])
+    level.ghost_starts = tuple(tuple(pos) for pos in header['ghost_starts'])
+    level.ghost_kinds = tuple(header['ghost_kinds'])
+
+    graph = JunctionGraph.__new__(JunctionGraph)
+    graph.width = level.width
+    graph.height = level.height
+    graph.scan_depth = header['scan_depth']
+    graph.moves = {}
+    graph.edges = {}
+    for cy, cx, moves, edges in header['edges']:
+        graph.moves[(cy, cx)] = tuple(moves)
+        graph.edges[(cy, cx)] = {move: (length, tuple(cell)) for move, length, cell in edges}
+    level.graph = graph
+    return level
+
+
+def load_level(path, cache_dir=CACHE_DIR):
+    # уровень из файла .txt или .json; собранные таблицы кэшируются по хэшу содержимого
+    with open(path, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    cache = None
+    if cache_dir is not None:
+        cache = os.path.join(os.path.dirname(os.path.abspath(path)), cache_dir,
+                             f'{digest}-{COMPILER_VERSION}.level')
+        try:
+            with open(cache, 'rb') as f:
+                return read_cache(f.read())
+        except (OSError, ValueError, KeyError, TypeError):
+            pass  # кэша нет или он испорчен - собираем заново
+
+    try:
+        text = data.decode('utf-8')
+    except UnicodeDecodeError:
+        raise LevelError(f'{path}: файл не в utf-8') from None
+    parse = parse_json if path.endswith('.json') else parse_text
+    rows, cell_size, pacman, ghosts, scan = parse(text, path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    level = compile_level(rows, cell_size, pacman, ghosts, name, path, scan)
+
+    if cache is not None:
+        try:
+            os.makedirs(os.path.dirname(cache), exist_ok=True)
+            temp = f'{cache}.{os.getpid()}'
+            with open(temp, 'wb') as f:
+                f.write(dump_cache(level))
+            os.replace(temp, cache)  # другие процессы видят только целый файл
+        except OSError:
+            pass  # без кэша уровень все равно работает
+    return level
+
+
+@functools.lru_cache(maxsize=None)
+def default_level():
+    # стандартный уровень собирается один раз на процесс и делится между всеми партиями
+    return load_level(CLASSIC)
@@ -0,0 +1,75 @@
+CELL_SIZE = 25  # размер клетки в пикселях
+
+MOVES = {'w': (0, -1), 'a': (-1, 0), 's': (0, 1), 'd': (1, 0)}
+# направления привидений: буква хода -> сдвиг (x, y) в клетках
+
+SCAN_DEPTH = 9  # глубина поиска узлов в курсе, уровень из курса задает ее строкой scan 9
+
+
+class JunctionGraph:
+    # граф узлов лабиринта (клетки 3 и 4) для привидений,
+    # собирается один раз по полю, дальше ходы берутся из таблицы
+    def __init__(self, board, scan_depth=None):
+        # scan_depth - поиск из курса: не дальше scan_depth - 1 клеток и только пока по обе стороны
+        # от узла есть поле, из-за этого он пропускает часть ходов; None - коридор проходится
+        # до узла или стены, край поля всегда стена (см. level.validate)
+        self.width = len(board[0])
+        self.height = len(board)
+        self.scan_depth = scan_depth
+        self.moves = {}  # (cy, cx) -> кортеж допустимых ходов в порядке их нахождения
+        self.edges = {}  # (cy, cx) -> {ход: (длина в клетках, клетка, куда ведет ход)}
+        for cy in range(self.height):
+            for cx in range(self.width):
+                if board[cy][cx] == 3 or board[cy][cx] == 4:
+                    self._compile_node(board, cy, cx)
+
+    def _compile_node(self, board, cy, cx):
+        # тот же обход, что раньше делал ghost_calc на каждом узле
+        oklist = {2, 3, 4}  # клетки по которым призрак может идти
+        notokey = {1}
+        if cy + 1 < self.height and board[cy + 1][cx] == 2:
+            # сверху в дом привидений заходить нельзя
+            oklist.remove(2)
+            notokey.add(2)
+        goodmoves = []
+        edges = {}
+        open_moves = {'w', 'a', 's', 'd'}  # стороны, где узел еще не найден
+        if self.scan_depth is None:
+            for i in range(1, max(self.width, self.height)):
+                # ходы находятся в том же порядке, что и у поиска из курса: по расстоянию, затем d, a, s, w
+                for move in ('d', 'a', 's', 'w'):
+                    if move in open_moves:
+                        dx, dy = MOVES[move]
+                        self._scan(board, move, cy + dy * i, cx + dx * i, i, oklist, notokey, open_moves,
+                                   goodmoves, edges)
+                if not open_moves:
+                    break
+        else:
+            for i in range(1, self.scan_depth):
+                if (cx + i) <= self.width - 1 and (cx - i) >= 0:
+                    for move, ny, nx in (('d', cy, cx + i), ('a', cy, cx - i)):
+                        self._scan(board, move, ny, nx, i, oklist, notokey, open_moves, goodmoves, edges)
+                if (cy + i) <= self.height - 1 and (cy - i) >= 0:
+                    for move, ny, nx in (('s', cy + i, cx), ('w', cy - i, cx)):
+                        self._scan(board, move, ny, nx, i, oklist, notokey, open_moves, goodmoves, edges)
+        self.moves[(cy, cx)] = tuple(goodmoves)
+        self.edges[(cy, cx)] = edges
+
+    def _scan(self, board, move, ny, nx, i, oklist, notokey, open_moves, goodmoves, edges):
+        if move not in open_moves:
+            return
+        if board[ny][nx] in oklist:
+            goodmoves.append(move)  # ход возможен, запоминаем его и следующий узел
+            edges[move] = (i, (ny, nx))
+            open_moves.remove(move)
+        elif board[ny][nx] in notokey:
+            open_moves.remove(move)
+
+    def ghost_moves(self, cy, cx):
+        # допустимые ходы привидения на клетке, пустой кортеж вне узлов
+        return self.moves.get((cy, cx), ())
+
+    def next_node(self, cy, cx, move):
+        # клетка, в которую приведет ход move из узла (cy, cx), и длина пути
+        length, cell = self.edges[(cy, cx)][move]
+        return cell, length
@@ -1,118 +1,92 @@
-import pygame
-import random
+import time
 
-WINDOW_SIZE = WIDTH, HEIGHT = 575, 550  # размер поля (19, 22), размер клетки 25
-TICK = pygame.USEREVENT + 1  # событие, нужно для отсчета одного момента
-PACMAN_MOTION = pygame.USEREVENT + 1  # событие для отсчета смены кадра
+STARTED = time.perf_counter()  # начало импорта, от него считается время до первого кадра
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import random  # noqa: E402
+
+import pygame  # noqa: E402
+
+from assets import assets  # noqa: E402
+from hud import Hud  # noqa: E402
+from level import default_level, ghost_count, load_level  # noqa: E402
+from render import FrameStats, build_background, frame  # noqa: E402
+from replay import Player, Recorder, Replay, fast_forward  # noqa: E402
+from simulation import KEY_STEPS, TICK_RATE, Simulation  # noqa: E402
+from spatial import CellHash  # noqa: E402
+
+PANEL_WIDTH = 100  # боковая панель справа от поля: очки и время кадра
+ANIMATION_MS = 35  # смена кадра анимации пакмана, не зависит от тиков и кадров
+FPS = 60  # частота отрисовки
+MAX_TICKS_PER_FRAME = 5  # больше тиков за кадр не догоняем, остальные выбрасываем
+STATS_TOP = 50  # верх оверлея со временем кадра в боковой панели
+STATS_HEIGHT = 120
+# pygame.init() не вызываем: импорт модуля ничего не запускает, окно создает main,
+# шрифты запускаются при первой надписи (hud.font), звука в игре нет
+
+
+def window_size(level):
+    # поле уровня и панель справа
+    return level.width * level.cell_size + PANEL_WIDTH, level.height * level.cell_size
+
+
+class StartupProfile:
+    # время от импорта до первого кадра по фазам запуска
+    def __init__(self, started=STARTED):
+        self.started = started
+        self.last = started
+        self.phases = {}
+
+    def mark(self, name):
+        # фаза name закончилась сейчас
+        now = time.perf_counter()
+        self.phases[name] = (now - self.last) * 1000
+        self.last = now
+
+    def report(self):
+        return {'phases_ms': self.phases, 'first_frame_ms': (self.last - self.started) * 1000}
+
+
+def lerp(old, new, alpha):
+    # позиция между двумя тиками логики для плавной отрисовки
+    return (round(old[0] + (new[0] - old[0]) * alpha),
+            round(old[1] + (new[1] - old[1]) * alpha))
 
-pygame.init()
 
 class Pacman(pygame.sprite.Sprite):
-    # основной класс, где прописан рендер поля и логика движения пакмана
-    def __init__(self, screen):
+    # пакман на экране: рендер поля и отрисовка, сами правила хода в Simulation
+    def __init__(self, screen, world):
         super().__init__()
-        self.retset = set()  # множество для записи допустимых кнопок
-        self.width = 19  # ширина поля
-        self.height = 22  # высота поля
         self.screen = screen  # поверхность, на которой все выводим
-
-        self.y = 12  # координаты пакмана во вложенном списке
-        self.x = 9  # нужен для метода create_pacman в классе Pacman
-        self.PacmanCurrentPos = (225, 300)
-        # сохраняет позицию пакмана, (225, 300) - позиция в начале игры в пикселях
+        self.world = world  # правила игры
+        self.state = world.state  # общее состояние партии, одно на все классы
+        self.cell_size = self.state.board.cell_size  # размер клетки в пикселях
 
         self.all_sprites = pygame.sprite.Group()
         self.main_pacman_sprite = pygame.sprite.Sprite()
-        self.main_pacman_sprite.image = pygame.image.load('data/pcmn_left_3.png')
-        self.main_pacman_sprite.rect = self.main_pacman_sprite.image.get_rect()
+        self.main_pacman_sprite.image = assets.image('pcmn_left_3.png')
+        self.main_pacman_sprite.rect = self.main_pacman_sprite.image.get_rect(topleft=self.state.pacman.pos)
         self.main_pacman_sprite.add(self.all_sprites)
         # спрайт пакмана
-        pygame.display.flip()
 
-        self.currentkey = 0
-        # для проверки возможности хода
+        self.prev_pos = self.state.pacman.pos  # позиция до последнего тика
+        self.drawn_pos = None  # где пакман нарисован сейчас
         self.count = 0  # счетчик для смены спарйта пакмана
 
-        self.left = 0  # отступ с левого верхнего края по оси x
-        self.top = 0  # отступ с левого верхнего края по оси y
-        self.cell_size = 25  # размер клетки в пикселях
-
-        self.board = [[1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-                      [1, 0, 0, 0, 3, 0, 0, 0, 3, 1, 3, 0, 0, 0, 3, 0, 0, 0, 1],
-                      [1, 0, 1, 1, 0, 1, 1, 1, 0, 1, 0, 1, 1, 1, 0, 1, 1, 0, 1],
-                      [1, 0, 1, 1, 0, 1, 1, 1, 0, 1, 0, 1, 1, 1, 0, 1, 1, 0, 1],
-                      [1, 3, 0, 0, 3, 0, 3, 0, 3, 0, 3, 0, 3, 0, 3, 0, 0, 3, 1],
-                      [1, 0, 1, 1, 0, 1, 0, 1, 1, 1, 1, 1, 0, 1, 0, 1, 1, 0, 1],
-                      [1, 3, 0, 0, 3, 1, 3, 0, 3, 1, 3, 0, 3, 1, 3, 0, 0, 3, 1],
-                      [1, 0, 1, 1, 0, 1, 1, 1, 0, 1, 0, 1, 1, 1, 0, 1, 1, 0, 1],
-                      [1, 3, 3, 1, 0, 1, 3, 0, 3, 3, 3, 0, 3, 1, 0, 1, 3, 3, 1],
-                      [1, 1, 0, 1, 0, 1, 0, 1, 2, 2, 2, 1, 0, 1, 0, 1, 0, 1, 1],
-                      [1, 3, 3, 0, 3, 0, 3, 1, 4, 4, 4, 1, 3, 0, 3, 0, 3, 3, 1],
-                      [1, 0, 1, 1, 0, 1, 0, 1, 1, 1, 1, 1, 0, 1, 0, 1, 1, 0, 1],
-                      [1, 0, 1, 3, 3, 1, 3, 0, 0, 0, 0, 0, 3, 1, 3, 3, 1, 0, 1],
-                      [1, 0, 1, 1, 0, 1, 0, 1, 1, 1, 1, 1, 0, 1, 0, 1, 1, 0, 1],
-                      [1, 3, 0, 0, 3, 0, 0, 0, 3, 1, 3, 0, 0, 0, 3, 3, 0, 3, 1],
-                      [1, 0, 1, 1, 0, 1, 1, 1, 3, 1, 3, 1, 1, 1, 0, 1, 1, 0, 1],
-                      [1, 3, 3, 1, 3, 3, 3, 0, 0, 0, 0, 0, 3, 3, 3, 1, 3, 3, 1],
-                      [1, 1, 0, 1, 0, 1, 0, 1, 1, 1, 1, 1, 0, 1, 0, 1, 0, 1, 1],
-                      [1, 3, 3, 0, 3, 1, 3, 0, 3, 1, 3, 0, 3, 1, 3, 0, 3, 3, 1],
-                      [1, 0, 1, 1, 1, 1, 1, 1, 0, 1, 0, 1, 1, 1, 1, 1, 1, 0, 1],
-                      [1, 0, 0, 0, 0, 0, 0, 0, 3, 0, 3, 0, 0, 0, 0, 0, 0, 0, 1],
-                      [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1]]
-        # 0 - клетка, по которой можно ходить,
-        # 1 - стена
-        # 2 - стенка выхода привидений
-        # 3 - узел, расходжение путей
-
     def render(self):
-        # рендер поля
-        for x in range(self.width):
-            for y in range(self.height):
-                if self.board[y][x] == 0 or self.board[y][x] == 3:
-                    pygame.draw.rect(self.screen, (0, 0, 0), (x * self.cell_size + self.left,
-                                                              y * self.cell_size + self.top,
-                                                              self.cell_size, self.cell_size), width=0)
-                if self.board[y][x] == 1:
-                    pygame.draw.rect(self.screen, (0, 0, 128), (x * self.cell_size + self.left,
-                                                                y * self.cell_size + self.top,
-                                                                self.cell_size, self.cell_size), width=0)
-                if self.board[y][x] == 2:
-                    pygame.draw.rect(self.screen, (252, 15, 192), (x * self.cell_size + self.left,
-                                                                   y * self.cell_size + self.top,
-                                                                   self.cell_size, self.cell_size), width=0)
-
-    def pacman_movement(self, key, cy, cx):
-        # key - проверяемый ход WASD в виде кода кнопок, (y, x) - координата клетки
-        y = (cy - self.top) // self.cell_size
-        x = (cx - self.left) // self.cell_size
-        self.retset = set()
-
-        horkeycheck = (key == 97 or key == 100)
-        verkeycheck = (key == 119 or key == 115)
-        # вертикальные и горизонтальные ходы
-        ycellcheck = (cy - self.top) % self.cell_size == 0
-        xcellcheck = (cx - self.top) % self.cell_size == 0
-        # координаты клеток
-
-        if (horkeycheck and ycellcheck) or (verkeycheck and xcellcheck):
-            if (self.board[y][(cx - self.left + 26) // self.cell_size] != 1 and
-                     self.board[y][(cx - self.left + 26) // self.cell_size] != 2):  # проверяем есть ли ход справа
-                self.retset.add(100)  # добавляем код кнопки D, если ход есть
-            if (self.board[(cy - self.left + 26) // self.cell_size][x] != 1 and
-                     self.board[(cy - self.left + 26) // self.cell_size][x] != 2):  # проверяем есть ли ход снизу
-                self.retset.add(115)  # добавляем код кнопки S, если ход есть
-            if (self.board[y][(cx - self.left - 1) // self.cell_size] != 1 and
-                     self.board[y][(cx - self.left - 1) // self.cell_size] != 2):  # проверяем есть ли ход слева
-                self.retset.add(97)  # добавляем код кнопки A, если ход есть
-            if (self.board[(cy - self.left - 1) // self.cell_size][x] != 1 and
-                     self.board[(cy - self.left - 1) // self.cell_size][x] != 2):  # проверяем есть ли ход сверху
-                self.retset.add(119)  # добавляем код кнопки W, если ход есть
-
-            if key in self.retset:  # проверяем допустим ли наш ход WASD
-                self.currentkey = key
-                pacman.pacman_move(key)  # вызываем метод самого движения
-        else:
-            pacman.pacman_move(self.currentkey)
+        # рендер поля: лабиринт рисуется в фон один раз, дальше фон только копируется
+        frame.set_background(self.screen, build_background(self.state.board, self.cell_size,
+                                                           self.screen.get_size()))
+        frame.redraw()
+
+    def press(self, key):
+        # нажатие кнопки WASD: запоминаем ее и сразу пробуем сходить
+        self.world.press(key)
+
+    def remember(self):
+        # перед тиком запоминаем позицию для интерполяции
+        self.prev_pos = self.state.pacman.pos
 
     def motion_counting(self):
         # счетчик для смены спрайта пакмана
@@ -120,379 +94,336 @@ class Pacman(pygame.sprite.Sprite):
         if self.count == 3:
             self.count = 0
 
-    def pacman_move(self, key):
-        # непосредственно движение пакмана
-        if key == 97:  # A
-            x = (self.PacmanCurrentPos[0] - 1 - self.left) // self.cell_size
-            y = (self.PacmanCurrentPos[1] - self.left) // self.cell_size
-            if self.board[y][x] != 1 and self.board[y][x] != 2:
-                pygame.draw.rect(self.screen, (0, 0, 0), (self.PacmanCurrentPos[0], self.PacmanCurrentPos[1],
-                                                          self.cell_size, self.cell_size), width=0)
-                self.PacmanCurrentPos = (self.PacmanCurrentPos[0] - 1, self.PacmanCurrentPos[1])
-                self.main_pacman_sprite.rect.x = self.PacmanCurrentPos[0]
-                self.main_pacman_sprite.rect.y = self.PacmanCurrentPos[1]
-                if self.count % 3 == 0:
-                    self.main_pacman_sprite.image = pygame.image.load('data/pcmn_circ.png')
-                    self.all_sprites.draw(screen)
-                elif self.count % 3 == 1:
-                    self.main_pacman_sprite.image = pygame.image.load('data/pcmn_left_2.png')
-                    self.all_sprites.draw(screen)
-                elif self.count % 3 == 2:
-                    self.main_pacman_sprite.image = pygame.image.load('data/pcmn_left_3.png')
-                    self.all_sprites.draw(screen)
-                pygame.display.flip()
-        elif key == 115:  # S
-            x = (self.PacmanCurrentPos[0] - self.left) // self.cell_size
-            y = (self.PacmanCurrentPos[1] + 1 - self.left) // self.cell_size
-            if self.board[y][x] != 1 and self.board[y][x] != 2:
-                pygame.draw.rect(self.screen, (0, 0, 0), (self.PacmanCurrentPos[0], self.PacmanCurrentPos[1],
-                                                          self.cell_size, self.cell_size), width=0)
-                self.PacmanCurrentPos = (self.PacmanCurrentPos[0], self.PacmanCurrentPos[1] + 1)
-                self.main_pacman_sprite.rect.x = self.PacmanCurrentPos[0]
-                self.main_pacman_sprite.rect.y = self.PacmanCurrentPos[1]
-                if self.count % 3 == 0:
-                    self.main_pacman_sprite.image = pygame.image.load('data/pcmn_circ.png')
-                    self.all_sprites.draw(screen)
-                elif self.count % 3 == 1:
-                    self.main_pacman_sprite.image = pygame.image.load('data/pcmn_down_2.png')
-                    self.all_sprites.draw(screen)
-                elif self.count % 3 == 2:
-                    self.main_pacman_sprite.image = pygame.image.load('data/pcmn_down_3.png')
-                    self.all_sprites.draw(screen)
-                pygame.display.flip()
-        elif key == 100:  # D
-            x = (self.PacmanCurrentPos[0] + 1 - self.left) // self.cell_size
-            y = (self.PacmanCurrentPos[1] - self.left) // self.cell_size
-            if self.board[y][x] != 1 and self.board[y][x] != 2:
-                pygame.draw.rect(self.screen, (0, 0, 0), (self.PacmanCurrentPos[0], self.PacmanCurrentPos[1],
-                                                          self.cell_size, self.cell_size), width=0)
-                self.PacmanCurrentPos = (self.PacmanCurrentPos[0] + 1, self.PacmanCurrentPos[1])
-                self.main_pacman_sprite.rect.x = self.PacmanCurrentPos[0]
-                self.main_pacman_sprite.rect.y = self.PacmanCurrentPos[1]
-                if self.count % 3 == 0:
-                    self.main_pacman_sprite.image = pygame.image.load('data/pcmn_circ.png')
-                    self.all_sprites.draw(screen)
-                elif self.count % 3 == 1:
-                    self.main_pacman_sprite.image = pygame.image.load('data/pcmn_right_2.png')
-                    self.all_sprites.draw(screen)
-                elif self.count % 3 == 2:
-                    self.main_pacman_sprite.image = pygame.image.load('data/pcmn_right_3.png')
-                    self.all_sprites.draw(screen)
-                pygame.display.flip()
-        elif key == 119:  # W
-            x = (self.PacmanCurrentPos[0] - self.left) // self.cell_size
-            y = (self.PacmanCurrentPos[1] - 1 - self.left) // self.cell_size
-            if self.board[y][x] != 1 and self.board[y][x] != 2:
-                pygame.draw.rect(self.screen, (0, 0, 0), (self.PacmanCurrentPos[0], self.PacmanCurrentPos[1],
-                                                          self.cell_size, self.cell_size), width=0)
-                self.PacmanCurrentPos = (self.PacmanCurrentPos[0], self.PacmanCurrentPos[1] - 1)
-                self.main_pacman_sprite.rect.x = self.PacmanCurrentPos[0]
-                self.main_pacman_sprite.rect.y = self.PacmanCurrentPos[1]
-                if self.count % 3 == 0:
-                    self.main_pacman_sprite.image = pygame.image.load('data/pcmn_circ.png')
-                    self.all_sprites.draw(screen)
-                elif self.count % 3 == 1:
-                    self.main_pacman_sprite.image = pygame.image.load('data/pcmn_up_2.png')
-                    self.all_sprites.draw(screen)
-                elif self.count % 3 == 2:
-                    self.main_pacman_sprite.image = pygame.image.load('data/pcmn_up_2.png')
-                    self.all_sprites.draw(screen)
-                pygame.display.flip()
-
-    def pacman_pos(self):
-        # для главного игрового цикла
-        return self.PacmanCurrentPos
-
-
-class Dots(Pacman, pygame.sprite.Sprite):
-    # класс точечек, которые ест пакман
-    def __init__(self, screen):
-        super().__init__(screen)
-        self.screen = screen
-        self.dots = pygame.sprite.Group()
+    def position(self, alpha):
+        return lerp(self.prev_pos, self.state.pacman.pos, alpha)
+
+    def erase(self, pos):
+        # стираем пакмана со старого места, если он сдвинулся
+        if pos != self.drawn_pos and self.drawn_pos is not None:
+            frame.restore((self.drawn_pos[0], self.drawn_pos[1], self.cell_size, self.cell_size))
 
-        self.score = 0
+    def draw(self, pos):
+        # True, если пакман нарисован заново
+        if pos == self.drawn_pos:
+            return False
+        key = self.state.pacman.currentkey
+        if key:
+            self.main_pacman_sprite.image = assets.frame(key, self.count % 3)
+        self.main_pacman_sprite.rect.topleft = pos
+        self.all_sprites.draw(self.screen)
+        frame.mark(self.main_pacman_sprite.rect)
+        self.drawn_pos = pos
+        return True
+
+
+class Dots:
+    # точечки, которые ест пакман; где они лежат - хранит общее состояние
+    def __init__(self, screen, world, hud):
+        self.screen = screen
+        self.world = world
+        self.state = world.state
+        self.hud = hud  # надписи, в том числе очки
+        self.cell_size = self.state.board.cell_size
+        self.world.eaten = []  # сюда Simulation складывает съеденные клетки
 
     def render_dots(self):
-        # рендер точечек
-        for y in range(len(self.board)):
-            for x in range(len(self.board[y])):
-                if self.board[y][x] == 0 or self.board[y][x] == 3:
-                    self.dot = pygame.sprite.Sprite()
-                    self.dot.image = pygame.image.load('data/dot.png')
-                    # спрайт точечек
-                    self.dot.rect = self.dot.image.get_rect()
-                    self.dot.add(self.dots)
-
-                    self.dot.rect.x = x * self.cell_size + self.left
-                    self.dot.rect.y = y * self.cell_size + self.top
-                    self.dots.draw(self.screen)
-                    pygame.display.flip()
-
-    def update_dots(self):
-        self.dots.draw(self.screen)
-        pygame.display.flip()
-        # постоянное обновление точечек
-
-    def update(self, pos):
-        self.main_pacman_sprite.rect.x = pos[0]
-        self.main_pacman_sprite.rect.y = pos[1]
-
-        if pygame.sprite.spritecollideany(self.main_pacman_sprite, self.dots):
-            self.score += 1
-            self.score_calc()
-        pygame.sprite.spritecollide(self.main_pacman_sprite, self.dots, True)
-        # если пакман сталкивается с точкой - 10 очков и точка исчезает
+        # рендер точечек: точки рисуются в фон, поэтому привидения их больше не стирают
+        image = assets.image('dot.png')
+        width = self.state.board.width
+        for i, dot in enumerate(self.state.dots):
+            if dot:
+                frame.paint(image, (i % width * self.cell_size, i // width * self.cell_size))
+
+    def draw(self):
+        # съеденные с прошлого кадра точки убираем из фона и с экрана, очки обновляем, если изменились;
+        # возвращает стертые клетки, спрайты на них надо нарисовать заново
+        restored = []
+        for x, y in self.world.eaten:
+            rect = pygame.Rect(x * self.cell_size, y * self.cell_size, self.cell_size, self.cell_size)
+            frame.unpaint(rect)
+            frame.restore(rect)
+            restored.append(rect)
+        self.world.eaten.clear()
+        self.score_calc()
+        return restored
 
     def score_calc(self):
-        # очки игрока
-        font = pygame.font.Font(None, 25)
-        text = font.render(f"score {self.score * 10}", True, (255, 255, 0))
-        place = text.get_rect(
-            center=(525, 20))
-        text_w = text.get_width()
-        text_h = text.get_height()
-        pygame.draw.rect(screen, (0, 0, 0), (place[0], place[1],
-                                             text_w, text_h), 0)
-        screen.blit(text, place)
-
-    def score_update(self):
-        # для главного игрового цикла
-        return self.score * 10
-
-
-class Ghosts(Pacman, pygame.sprite.Sprite):
-    # класс привидений, где прописана вся их логика
-    def __init__(self, screen):
-        super().__init__(screen)
-        self.screen = screen
-        self.CianCurrentPos = (200, 250)
-        self.RedCurrentPos = (225, 200)
-        self.YellCurrentPos = (225, 250)
-        self.PinkCurrentPos = (250, 250)
-        # начальное положение привидений
-        self.ghosts = pygame.sprite.Group()
-        self.dots = Dots(self.screen)
+        # очки игрока, HUD перерисует их только если они изменились
+        self.hud.score(self.state.score * 10)
 
-        self.pink_cell = [(250, 225), (225, 225), (200, 225)]
 
-        self.ghostpos = []
-        self.ghostsmoves = {}
+class Ghosts:
+    # привидения на экране, их ходы считает Simulation; сколько их и какие - задает уровень
+    def __init__(self, screen, world):
+        self.screen = screen
+        self.world = world
+        self.state = world.state
+        board = self.state.board
+        self.cell_size = board.cell_size
+        self.ghosts = pygame.sprite.Group()
+        self.ghostpos = []  # спрайты в том же порядке, что и привидения в state.ghosts
+        self.prev_pos = [g.pos for g in self.state.ghosts]
+        self.grid = CellHash(board.width, board.height, board.cell_size)  # где какой спрайт на экране
 
     def render_ghosts(self):
         # рендер всех привидений
-        self.g_cian = pygame.sprite.Sprite()
-        self.g_cian.image = pygame.image.load('data/ghostcian.png')
-        self.g_cian.rect = self.g_cian.image.get_rect()
-        self.g_cian.rect.x = self.CianCurrentPos[0]
-        self.g_cian.rect.y = self.CianCurrentPos[1]
-        self.g_cian.add(self.ghosts)
-
-        self.ghostsmoves[self.g_cian] = ''
-        self.ghostpos.append(self.g_cian)
-
-        self.g_red = pygame.sprite.Sprite()
-        self.g_red.image = pygame.image.load('data/ghostred.png')
-        self.g_red.rect = self.g_red.image.get_rect()
-        self.g_red.rect.x = self.RedCurrentPos[0]
-        self.g_red.rect.y = self.RedCurrentPos[1]
-        self.g_red.add(self.ghosts)
-
-        self.ghostsmoves[self.g_red] = ''
-        self.ghostpos.append(self.g_red)
-
-        self.g_yell = pygame.sprite.Sprite()
-        self.g_yell.image = pygame.image.load('data/ghostyellow.png')
-        self.g_yell.rect = self.g_yell.image.get_rect()
-        self.g_yell.rect.x = self.YellCurrentPos[0]
-        self.g_yell.rect.y = self.YellCurrentPos[1]
-        self.g_yell.add(self.ghosts)
-
-        self.ghostsmoves[self.g_yell] = ''
-        self.ghostpos.append(self.g_yell)
-
-        self.g_pink = pygame.sprite.Sprite()
-        self.g_pink.image = pygame.image.load('data/ghostpink.png')
-        self.g_pink.rect = self.g_pink.image.get_rect()
-        self.g_pink.rect.x = self.PinkCurrentPos[0]
-        self.g_pink.rect.y = self.PinkCurrentPos[1]
-        self.g_pink.add(self.ghosts)
-
-        self.ghostsmoves[self.g_pink] = ''
-        self.ghostpos.append(self.g_pink)
+        for i, g in enumerate(self.state.ghosts):
+            sprite = pygame.sprite.Sprite()
+            sprite.image = assets.image(f'ghost{g.kind}.png')
+            sprite.rect = sprite.image.get_rect(topleft=g.pos)
+            sprite.add(self.ghosts)
+            self.ghostpos.append(sprite)
+            self.grid.place(i, g.x, g.y)
 
         self.ghosts.draw(self.screen)
-        pygame.display.flip()
-
-    def ghost_move(self, g):
-        # перемещение привидений
-        pygame.draw.rect(self.screen, (0, 0, 0), (g.rect.x, g.rect.y,
-                                                    self.cell_size, self.cell_size), width=0)
-        if self.ghostsmoves[g] == 'w':
-            g.rect.y = g.rect.y - 1
-        if self.ghostsmoves[g] == 'a':
-            g.rect.x = g.rect.x - 1
-        if self.ghostsmoves[g] == 's':
-            g.rect.y = g.rect.y + 1
-        if self.ghostsmoves[g] == 'd':
-            g.rect.x = g.rect.x + 1
-        self.ghosts.draw(self.screen)
-        pygame.display.flip()
-
-    def ghost_calc(self):
-        for g in self.ghostpos:
-            x = g.rect.x  # координаты призрака
-            y = g.rect.y  # в пикселях по х и у
-            cx = (x - self.left) // self.cell_size  # координаты призрака
-            cy = (y - self.top) // self.cell_size  # в клетках по х и у
-
-            if (x - self.left) % self.cell_size == 0 and (y - self.top) % self.cell_size == 0:
-                oklist = {2, 3, 4}  # клетки по которым призрак может идти
-                notokey = {1}
-                goodmoves = []
-                # ходы, которые допустимы на той или иной клетки
-                wflag = True
-                aflag = True
-                sflag = True
-                dflag = True
-                # выше прописаны флаги, которые меняются на False, когда в стороне
-                # найдено перепутье в лабиринте, где можно повернуть
-                if self.board[cy][cx] == 3 or self.board[cy][cx] == 4:  # проверка, находится ли призрак в узле
-                    if self.board[cy + 1][cx] == 2:
-                        oklist.remove(2)
-                        notokey.add(2)
-                    for i in range(1, 9):  # нахождение узла в близжайших 9-ти клетках
-                        if (cx + i) <= 18 and (cx - i) >= 0:
-                            if self.board[cy][cx + i] in oklist and dflag:
-                                goodmoves.append('d')  # добавлем букву хода, если ход возможен
-                                dflag = False
-                            elif self.board[cy][cx + i] in notokey:
-                                dflag = False
-                            if self.board[cy][cx - i] in oklist and aflag:
-                                goodmoves.append('a')  # добавлем букву хода, если ход возможен
-                                aflag = False
-                            elif self.board[cy][cx - i] in notokey:
-                                aflag = False
-
-                        if (cy + i) <= 21 and (cy - i) >= 0:
-                            if self.board[cy + i][cx] in oklist and sflag:
-                                goodmoves.append('s')  # добавлем букву хода, если ход возможен
-                                sflag = False
-                            elif self.board[cy + i][cx] in notokey:
-                                sflag = False
-                            if self.board[cy - i][cx] in oklist and wflag:
-                                goodmoves.append('w')  # добавлем букву хода, если ход возможен
-                                wflag = False
-                            elif self.board[cy - i][cx] in notokey:
-                                wflag = False
-
-                if len(goodmoves) >= 1:
-                    move = random.randint(0, len(goodmoves) - 1)  # случайно выбираем ход из возможных
-                    self.ghostsmoves[g] = goodmoves[move]
-                self.ghost_move(g)  # перемещаем привидение
-            else:  #
-                self.ghost_move(g)  # перемещаем привидение
-            self.ghosts.draw(self.screen)
-            pygame.display.update()
-        for p in self.pink_cell:  # обновление розовых клеток, когда привидения через них проходят
-            pygame.draw.rect(self.screen, (252, 15, 192), (p[0], p[1],
-                                self.cell_size, self.cell_size), width=0)
-
-    def collide_pacman(self, pos):  # просчитываем столкновения с памананом
-        # столкновение с пакманом
-        self.main_pacman_sprite.rect.x = pos[0]
-        self.main_pacman_sprite.rect.y = pos[1]
-        if pygame.sprite.spritecollideany(self.main_pacman_sprite, self.ghosts):
-            return True
+        frame.mark(self.screen.get_rect())
+
+    def remember(self):
+        self.prev_pos = [g.pos for g in self.state.ghosts]
+
+    def positions(self, alpha):
+        return [lerp(old, g.pos, alpha) for old, g in zip(self.prev_pos, self.state.ghosts)]
+
+    def erase(self, positions):
+        # стираем всех сдвинувшихся привидений до того, как кого-то рисовать
+        erased = []
+        for sprite, pos in zip(self.ghostpos, positions):
+            if sprite.rect.topleft != pos:
+                frame.restore(sprite.rect)
+                erased.append(sprite.rect.copy())
+        return erased
+
+    def draw(self, positions, cover=()):
+        # рисуем сдвинувшихся привидений и тех, кого задело стирание или чужая отрисовка;
+        # cover - клетки, нарисованные в этом кадре под привидениями: пакман и стертые точки
+        old = []
+        for i, (sprite, pos) in enumerate(zip(self.ghostpos, positions)):
+            if sprite.rect.topleft != pos:
+                old.append(sprite.rect.topleft)
+                sprite.rect.topleft = pos
+                self.grid.place(i, pos[0], pos[1])
+                frame.mark(sprite.rect)
+                old.append(pos)
+        if not old and not cover:
+            return
+        redraw = set()
+        for x, y in old:
+            redraw.update(self.grid.touching(x, y))  # там фон восстановлен или появилось привидение
+        for rect in cover:
+            redraw.update(self.grid.touching(rect.x, rect.y))
+        pending = list(redraw)
+        while pending:
+            # привидение рисуется поверх тех, у кого номер меньше,
+            # поэтому пересекающихся с ним и с большим номером тоже рисуем заново
+            i = pending.pop()
+            x, y = self.ghostpos[i].rect.topleft
+            for j in self.grid.touching(x, y):
+                if j > i and j not in redraw:
+                    redraw.add(j)
+                    pending.append(j)
+        for i in sorted(redraw):
+            sprite = self.ghostpos[i]
+            self.screen.blit(sprite.image, sprite.rect)
+
+
+class Game:
+    # игровой цикл с фиксированным шагом логики: тики идут с частотой tick_rate
+    # независимо от частоты кадров, отрисовка интерполирует позиции между тиками
+    def __init__(self, screen, world, tick_rate=TICK_RATE, fps=FPS, show_stats=False, recorder=None,
+                 player=None):
+        self.screen = screen
+        self.world = world
+        self.step_ms = 1000 / tick_rate
+        self.fps = fps
+        self.pacman = Pacman(screen, world)
+        level = world.state.board
+        field = level.width * level.cell_size
+        self.hud = Hud(screen, score_center=(field + PANEL_WIDTH // 2, 20),
+                       message_center=(field // 2, level.height * level.cell_size // 2))
+        self.stats_rect = (field + 3, STATS_TOP, PANEL_WIDTH - 6, STATS_HEIGHT)
+        self.dots = Dots(screen, world, self.hud)
+        self.ghosts = Ghosts(screen, world)
+        self.stats = FrameStats()
+        self.show_stats = show_stats
+        self.accumulator = 0.0  # накопленное время, еще не отработанное тиками
+        self.animation = 0.0  # накопленное время для анимации
+        self.finished = False  # надпись о конце игры уже выведена
+        self.recorder = recorder  # запись нажатий в файл
+        self.player = player  # нажатия из записи вместо клавиатуры
+
+    def start(self):
+        self.pacman.render()
+        self.dots.score_calc()
+        self.dots.render_dots()
+        self.ghosts.render_ghosts()  # первый ход привидений уже сделан в Simulation
+        frame.flip()
+
+    def handle(self, event):
+        if event.type == pygame.KEYDOWN:  # проверка по кнопкам ASDW
+            if event.key in KEY_STEPS and self.player is None:
+                self.press(event.key)
+            elif event.key == pygame.K_F3:  # показать/спрятать время кадра
+                self.show_stats = not self.show_stats
+                frame.restore(self.stats_rect)
+
+    def press(self, key):
+        if self.recorder is not None and self.world.result is None:
+            self.recorder.record(self.world.tick, key)
+        self.pacman.press(key)
+
+    def over(self):
+        # логика стоит: партия закончена или кончилась запись
+        if self.player is not None:
+            return self.player.finished(self.world)
+        return self.world.result is not None
+
+    def tick(self):
+        # один тик логики
+        if self.player is not None:
+            self.player.feed(self.world)  # нажатия из записи перед тиком, как KEYDOWN
+        self.pacman.remember()
+        self.ghosts.remember()
+        self.world.step()
+
+    def update(self, elapsed_ms):
+        # отрабатываем накопленное время целыми тиками
+        self.accumulator += elapsed_ms
+        ticks = 0
+        while self.accumulator >= self.step_ms and not self.over():
+            if ticks == MAX_TICKS_PER_FRAME:
+                # логика не успевает за временем - лишнее выбрасываем, а не копим
+                self.stats.dropped += int(self.accumulator // self.step_ms)
+                self.accumulator %= self.step_ms
+                break
+            self.tick()
+            self.accumulator -= self.step_ms
+            ticks += 1
+        self.animation += elapsed_ms
+        while self.animation >= ANIMATION_MS:
+            self.pacman.motion_counting()
+            self.animation -= ANIMATION_MS
+        return ticks
+
+    def draw(self):
+        alpha = 0.0 if self.over() else min(self.accumulator / self.step_ms, 1.0)
+        pacman_pos = self.pacman.position(alpha)
+        ghosts_pos = self.ghosts.positions(alpha)
+        self.pacman.erase(pacman_pos)
+        if self.pacman.main_pacman_sprite.rect.collidelist(self.ghosts.erase(ghosts_pos)) != -1:
+            self.pacman.drawn_pos = None  # привидение задело пакмана, рисуем его заново
+        restored = self.dots.draw()
+        if self.pacman.main_pacman_sprite.rect.collidelist(restored) != -1:
+            self.pacman.drawn_pos = None  # точку под пакманом стерли вместе с ним
+        if self.pacman.draw(pacman_pos):
+            restored.append(self.pacman.main_pacman_sprite.rect)
+        self.ghosts.draw(ghosts_pos, restored)
+        if self.world.result == 'lose' and not self.finished:
+            # в случае столкновения - конец игры, проигрыш
+            self.message("Game Over")
+        if self.world.result == 'win' and not self.finished:
+            # если съедены все точки - конец игры, победа
+            self.message("You win!")
+        if self.show_stats:
+            self.stats.draw(self.screen, self.stats_rect, self.hud.small)
+
+    def message(self, line):
+        self.hud.message(line)
+        self.finished = True
+
+    def run(self):
+        clock = pygame.time.Clock()
+        running = True
+        previous = time.perf_counter()
+        while running:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                self.handle(event)
+            now = time.perf_counter()
+            elapsed_ms = (now - previous) * 1000
+            previous = now
+
+            ticks = self.update(elapsed_ms)
+            rendered = time.perf_counter()
+            self.draw()
+            frame.present()  # один вывод на экран за кадр
+            done = time.perf_counter()
+            self.stats.add((rendered - now) * 1000, (done - rendered) * 1000, ticks)
+            clock.tick(self.fps)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Пакман')
+    parser.add_argument('--tick-rate', type=float, help='тиков логики в секунду')
+    parser.add_argument('--fps', type=int, default=FPS, help='частота отрисовки')
+    parser.add_argument('--stats', action='store_true',
+                        help='показать время кадра (F3) и вывести сводку при выходе')
+    parser.add_argument('--level', help='файл уровня (.txt или .json), по умолчанию levels/classic.txt')
+    parser.add_argument('--seed', type=int, help='seed привидений, по умолчанию случайный')
+    parser.add_argument('--ghosts', type=ghost_count, help='число привидений, места уровня повторяются по кругу')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--record', metavar='FILE', help='записать партию в файл')
+    source.add_argument('--replay', metavar='FILE', help='проиграть записанную партию')
+    parser.add_argument('--skip-to', type=int, metavar='TICK',
+                        help='при --replay прокрутить без отрисовки до этого тика')
+    parser.add_argument('--fast', action='store_true', help='при --replay прокрутить всю запись без отрисовки')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='вывести время до первого кадра по фазам и выйти')
+    args = parser.parse_args(argv)
+    profile = StartupProfile()
+    profile.mark('import')
+
+    try:
+        level = load_level(args.level) if args.level else default_level()
+        replay = Replay(args.replay) if args.replay else None
+        if replay is not None:
+            replay.check_level(level)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    if replay is not None:
+        seed = replay.seed
+        ghosts = replay.ghosts
+        tick_rate = args.tick_rate or replay.tick_rate
+        player = Player(replay, replay.end_tick)
+    else:
+        seed = args.seed if args.seed is not None else random.randrange(2 ** 63)
+        ghosts = args.ghosts
+        tick_rate = args.tick_rate or TICK_RATE
+        player = None
+    recorder = Recorder(args.record, seed, tick_rate, level, ghosts) if args.record else None
+    profile.mark('level')
+
+    world = Simulation(level, ghosts=level.roster(ghosts), seed=seed)  # одно общее состояние и правила на всю игру
+    if player is not None and (args.fast or args.skip_to is not None):
+        fast_forward(world, player, None if args.fast else args.skip_to)
+    profile.mark('simulation')
+
+    pygame.display.init()  # из всех подсистем SDL игре нужно только окно
+    screen = pygame.display.set_mode(window_size(level))
+    profile.mark('display')
+    assets.load()  # все картинки грузим один раз до начала игры
+    profile.mark('assets')
+
+    game = Game(screen, world, tick_rate, args.fps, args.stats, recorder, player)
+    profile.mark('game')
+    game.start()  # первый кадр выводится одним flip
+    profile.mark('first_frame')
+    try:
+        if args.profile_startup:
+            print(json.dumps(profile.report(), indent=2))
         else:
-            return False
-        # "жизнь" у пакмана только одна, чтобы было сложней))
+            game.run()
+    finally:
+        if recorder is not None:
+            recorder.close(world.tick)
+        if replay is not None:
+            replay.close()
+    if args.stats:
+        summary = game.stats.summary()
+        summary['assets'] = assets.stats()  # попадания в кэш картинок: с диска после старта ничего не читается
+        print(json.dumps(summary, indent=2))
+    pygame.quit()
 
 
 if __name__ == '__main__':
-    screen = pygame.display.set_mode(WINDOW_SIZE)
-
-    running = True
-
-    pacman = Pacman(screen)
-    # передаем только поверхность, потому что размеры известны
-    pacman.render()
-
-    PacmanCurrentKey = ''
-    dot = Dots(screen)
-    dot.score_calc()
-    dot.render_dots()
-    pygame.time.set_timer(TICK, 15)
-    pygame.time.set_timer(PACMAN_MOTION, 35)
-    ghosts = Ghosts(screen)
-    ghosts.render_ghosts()
-    ghosts.ghost_calc()
-    pygame.display.flip()
-
-    while running:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            if event.type == pygame.KEYDOWN:  # проверка по кнопкам ASDW
-                pacman_cur_pos = pacman.pacman_pos()  # получаем координаты в реальном времени
-                if event.key == 97:  # проверяем A
-                    PacmanCurrentKey = 97
-                    pacman.pacman_movement(97, pacman_cur_pos[1], pacman_cur_pos[0])
-                    # вызов метода проверки возможности хода
-                if event.key == 115:  # проверяем S
-                    PacmanCurrentKey = 115
-                    pacman.pacman_movement(115, pacman_cur_pos[1], pacman_cur_pos[0])
-                    # вызов метода проверки возможности хода
-                if event.key == 100:  # проверяем D
-                    PacmanCurrentKey = 100
-                    pacman.pacman_movement(100, pacman_cur_pos[1], pacman_cur_pos[0])
-                    # вызов метода проверки возможности хода
-                if event.key == 119:  # проверяем W
-                    PacmanCurrentKey = 119
-                    pacman.pacman_movement(119, pacman_cur_pos[1], pacman_cur_pos[0])
-                    # вызов метода проверки возможности хода
-            if event.type == TICK:
-                pacman_cur_pos = pacman.pacman_pos()
-
-                score = dot.score_update()
-
-                ghosts.ghost_calc()
-                dot.update(pacman_cur_pos)
-                dot.update_dots()
-                pacman.pacman_movement(PacmanCurrentKey, pacman_cur_pos[1], pacman_cur_pos[0])
-                if ghosts.collide_pacman(pacman_cur_pos):
-                    # в случае столкновения - конец игры, проигрыш
-                    pygame.time.set_timer(TICK, 0)
-                    pygame.time.set_timer(PACMAN_MOTION, 0)
-
-                    font = pygame.font.Font(None, 50)
-                    text = font.render("Game Over", True, (232, 72, 167))
-                    text_x = 112
-                    text_y = 150
-                    place = text.get_rect(
-                        center=(237, 275))
-                    text_w = text.get_width()
-                    text_h = text.get_height()
-                    pygame.draw.rect(screen, (0, 0, 0), (place[0], place[1],
-                                                           text_w, text_h), 0)
-                    screen.blit(text, place)
-                if score == 2050:
-                    # если съедены все точки - конец игры, победа
-                    pygame.time.set_timer(TICK, 0)
-                    pygame.time.set_timer(PACMAN_MOTION, 0)
-
-                    font = pygame.font.Font(None, 50)
-                    text = font.render("You win!", True, (232, 72, 167))
-                    text_x = 112
-                    text_y = 150
-                    place = text.get_rect(
-                        center=(237, 275))
-                    text_w = text.get_width()
-                    text_h = text.get_height()
-                    pygame.draw.rect(screen, (0, 0, 0), (place[0], place[1],
-                                                         text_w, text_h), 0)
-                    screen.blit(text, place)
-            if event.type == PACMAN_MOTION:
-                pacman.motion_counting()
-        pygame.display.flip()
-    pygame.quit()
+    main()
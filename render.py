@@ -0,0 +1,141 @@
+import collections
+
+import pygame
+
+CELL_COLORS = {0: (0, 0, 0), 1: (0, 0, 128), 2: (252, 15, 192), 3: (0, 0, 0)}
+# цвета клеток поля: проход, стена, стенка выхода привидений, узел
+
+
+def build_background(board, cell_size, size, left=0, top=0):
+    # рисуем лабиринт один раз на отдельной поверхности
+    background = pygame.Surface(size)
+    if pygame.display.get_surface() is not None:
+        background = background.convert()
+    background.fill((0, 0, 0))
+    for y in range(len(board)):
+        for x in range(len(board[y])):
+            if board[y][x] in CELL_COLORS:
+                pygame.draw.rect(background, CELL_COLORS[board[y][x]], (x * cell_size + left,
+                                                                        y * cell_size + top,
+                                                                        cell_size, cell_size), width=0)
+    return background
+
+
+class Frame:
+    # собирает измененные за кадр прямоугольники и выводит их
+    # на экран одним вызовом display.update в конце кадра
+    def __init__(self):
+        self.dirty = []
+        self.screen = None
+        self.maze = None  # готовая картинка пустого лабиринта
+        self.background = None  # лабиринт вместе с несъеденными точками
+
+    def set_background(self, screen, background):
+        self.screen = screen
+        self.maze = background
+        self.background = background.copy()
+
+    def paint(self, image, pos):
+        # рисуем неподвижную картинку (точку) прямо в фон и на экран
+        self.background.blit(image, pos)
+        self.screen.blit(image, pos)
+        self.dirty.append(pygame.Rect(pos, image.get_size()))
+
+    def unpaint(self, rect):
+        # убираем картинку из фона, на экране ее сотрет следующий restore
+        rect = pygame.Rect(rect)
+        self.background.blit(self.maze, rect, rect)
+
+    def restore(self, rect):
+        # стираем спрайт, копируя кусок фона на его место
+        rect = pygame.Rect(rect)
+        self.screen.blit(self.background, rect, rect)
+        self.dirty.append(rect)
+
+    def redraw(self):
+        # полная перерисовка поля - один blit фона
+        self.screen.blit(self.background, (0, 0))
+        self.dirty.append(self.screen.get_rect())
+
+    def mark(self, rect):
+        # запоминаем область экрана, которая изменилась
+        self.dirty.append(pygame.Rect(rect))
+
+    def present(self):
+        # один вывод на экран за кадр
+        if self.dirty:
+            pygame.display.update(self.dirty)
+            self.dirty = []
+
+    def flip(self):
+        # полная перерисовка окна, например при старте игры
+        pygame.display.flip()
+        self.dirty = []
+
+
+class FrameStats:
+    # замер времени обновления логики и отрисовки по кадрам, гистограмма и оверлей
+    BUCKETS = (1, 2, 4, 8, 16, 33)  # границы корзин гистограммы времени кадра в мс
+
+    def __init__(self, size=300):
+        self.update_ms = collections.deque(maxlen=size)  # последние кадры
+        self.render_ms = collections.deque(maxlen=size)
+        self.ticks = collections.deque(maxlen=size)  # тиков логики за кадр
+        self.histogram = [0] * (len(self.BUCKETS) + 1)  # все кадры за игру
+        self.frames = 0
+        self.dropped = 0  # тики, выброшенные из-за того, что логика не успевала
+
+    def add(self, update_ms, render_ms, ticks):
+        self.update_ms.append(update_ms)
+        self.render_ms.append(render_ms)
+        self.ticks.append(ticks)
+        self.frames += 1
+        total = update_ms + render_ms
+        bucket = 0
+        while bucket < len(self.BUCKETS) and total >= self.BUCKETS[bucket]:
+            bucket += 1
+        self.histogram[bucket] += 1
+
+    @staticmethod
+    def percentile(values, p):
+        if not values:
+            return 0.0
+        values = sorted(values)
+        return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+    def summary(self):
+        return {
+            'frames': self.frames,
+            'dropped_ticks': self.dropped,
+            'update_ms_p50': self.percentile(self.update_ms, 50),
+            'update_ms_p99': self.percentile(self.update_ms, 99),
+            'render_ms_p50': self.percentile(self.render_ms, 50),
+            'render_ms_p99': self.percentile(self.render_ms, 99),
+            'histogram_ms': dict(zip([f'<{b}' for b in self.BUCKETS] + [f'>={self.BUCKETS[-1]}'],
+                                     self.histogram)),
+        }
+
+    def draw(self, screen, rect, text):
+        # оверлей в боковой панели: p50/p99 логики и отрисовки и гистограмма кадров;
+        # text - кэш символов из hud.Text, чтобы не растеризовать шрифт каждый кадр
+        rect = pygame.Rect(rect)
+        frame.restore(rect)
+        lines = [
+            ('upd ', f"{self.percentile(self.update_ms, 50):.1f}/{self.percentile(self.update_ms, 99):.1f}"),
+            ('rnd ', f"{self.percentile(self.render_ms, 50):.1f}/{self.percentile(self.render_ms, 99):.1f}"),
+            ('drop ', self.dropped),
+        ]
+        y = rect.y
+        for label, value in lines:
+            parts, place = text.parts(label, value)
+            text.blit(screen, parts, (rect.x, y))
+            y += place.height
+        most = max(self.histogram) or 1
+        for count in self.histogram:
+            y += 4
+            width = (rect.width - 4) * count // most
+            pygame.draw.rect(screen, (0, 160, 0), (rect.x, y, width, 6), width=0)
+            y += 6
+
+
+frame = Frame()  # общий кадр для всех классов игры
@@ -0,0 +1,164 @@
+import argparse
+import json
+import struct
+import time
+
+from level import default_level, load_level
+from simulation import Simulation
+
+# Файл записи партии:
+#   заголовок: b'PMRP', версия (1 байт), seed (int64), tick_rate (double), последний тик (uint32),
+#              хэш уровня (32 байта), число привидений (uint16, 0 - сколько на уровне)
+#   дальше записи до конца файла: разница тиков с прошлой записью (varint) и код кнопки (1 байт)
+# Нажатие с тиком t сделано перед t-м тиком, как в Simulation.run.
+MAGIC = b'PMRP'
+VERSION = 6  # меняется и вместе с правилами: старые записи по новым правилам не сойдутся
+HEADER = struct.Struct('<4sBqdI32sH')
+END_OFFSET = 21  # где в заголовке лежит последний тик
+NO_END = 0xFFFFFFFF  # запись оборвалась и последний тик неизвестен
+
+
+class ReplayError(ValueError):
+    pass
+
+
+class Recorder:
+    # пишет нажатия прямо в файл по мере игры, в памяти ничего не копится
+    def __init__(self, path, seed, tick_rate, level, ghosts=None):
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed, tick_rate, NO_END, bytes.fromhex(level.digest),
+                                    ghosts if ghosts is not None else 0))
+        self.last_tick = 0
+
+    def record(self, tick, key):
+        delta = tick - self.last_tick
+        data = bytearray()
+        while delta >= 0x80:
+            data.append(delta & 0x7f | 0x80)
+            delta >>= 7
+        data.append(delta)
+        data.append(key)
+        self.file.write(data)
+        self.last_tick = tick
+
+    def close(self, tick):
+        # в заголовок дописываем, на каком тике запись закончилась
+        if self.file.closed:
+            return
+        self.file.seek(END_OFFSET)
+        self.file.write(struct.pack('<I', tick))
+        self.file.close()
+
+
+class Replay:
+    # читает запись с диска по одной записи, итерируется парами (тик, кнопка)
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        header = self.file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ReplayError(f'{path}: файл короче заголовка')
+        if header[:4] != MAGIC:
+            raise ReplayError(f'{path}: это не запись партии')
+        if header[4] != VERSION:
+            raise ReplayError(f'{path}: неизвестная версия записи {header[4]}')
+        _, _, self.seed, self.tick_rate, end, digest, ghosts = HEADER.unpack(header)
+        self.end_tick = None if end == NO_END else end
+        self.level_digest = digest.hex()
+        self.ghosts = ghosts or None  # None - привидения уровня, иначе их число для Level.roster
+
+    def check_level(self, level):
+        # запись проигрывается только на том уровне, на котором ее сделали
+        if level.digest != self.level_digest:
+            raise ReplayError(f'запись сделана на другом уровне, не на {level.name}')
+
+    def __iter__(self):
+        read = self.file.read
+        tick = 0
+        while True:
+            delta = 0
+            shift = 0
+            while True:
+                byte = read(1)
+                if not byte:
+                    if shift:
+                        raise ReplayError('запись оборвана посреди тика')
+                    return
+                delta |= (byte[0] & 0x7f) << shift
+                shift += 7
+                if byte[0] < 0x80:
+                    break
+            key = read(1)
+            if not key:
+                raise ReplayError('запись оборвана перед кнопкой')
+            tick += delta
+            yield tick, key[0]
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Player:
+    # подает нажатия из записи в Simulation перед нужным тиком, вместо клавиатуры
+    def __init__(self, records, end_tick=None):
+        self.records = iter(records)
+        self.pending = next(self.records, None)
+        self.end_tick = end_tick
+
+    def feed(self, sim):
+        while self.pending is not None and self.pending[0] <= sim.tick:
+            sim.press(self.pending[1])
+            self.pending = next(self.records, None)
+
+    def finished(self, sim):
+        # запись кончилась: партия закончена или дошли до последнего тика записи; если запись
+        # оборвана и последний тик неизвестен - до последнего нажатия, дальше партия могла бы
+        # идти вечно (пакман стоит там, куда привидения не доходят)
+        if sim.result is not None:
+            return True
+        if self.end_tick is None:
+            return self.pending is None
+        return sim.tick >= self.end_tick
+
+
+def fast_forward(sim, player, until=None):
+    # прокрутка без отрисовки: до конца записи или до тика until
+    while True:
+        player.feed(sim)
+        if player.finished(sim) or (until is not None and sim.tick >= until):
+            return sim
+        sim.step()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Прокрутка записанной партии без экрана')
+    parser.add_argument('replay', help='файл записи')
+    parser.add_argument('--until', type=int, help='остановиться на этом тике')
+    parser.add_argument('--level', help='файл уровня, на котором сделана запись')
+    args = parser.parse_args(argv)
+
+    try:
+        replay = Replay(args.replay)
+        level = load_level(args.level) if args.level else default_level()
+        replay.check_level(level)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    with replay:
+        sim = Simulation(level, ghosts=level.roster(replay.ghosts), seed=replay.seed)
+        start = time.perf_counter()
+        fast_forward(sim, Player(replay, replay.end_tick), args.until)
+        elapsed = time.perf_counter() - start
+    report = sim.summary()
+    report['seed'] = replay.seed
+    report['ticks_per_sec'] = sim.tick / elapsed if elapsed else 0.0
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == '__main__':
+    main()
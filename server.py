@@ -0,0 +1,381 @@
+import argparse
+import asyncio
+import bisect
+import json
+import random
+import struct
+
+from level import default_level, ghost_count, load_level
+from simulation import TICK_RATE, Simulation
+from tournament import random_agent
+
+# Протокол поверх TCP: каждое сообщение - длина тела (uint32) и тело, первый байт тела - тип.
+#   клиент -> сервер: b'J' номер сессии (uint16), роль (1 байт: 0 - игрок, 1 - зритель);
+#                     b'K' код кнопки (1 байт), только от игроков;
+#                     b'A' тик последнего принятого снимка (uint32)
+#   сервер -> клиент: b'W' номер сессии (uint16), seed (int64), хэш уровня (32 байта), число привидений (uint16);
+#                     b'S' снимок: тик (uint32), база (int32), итог (1 байт), очки (uint16),
+#                          сдвинулся ли пакман (1 байт) и его позиция (int16 x 2), если сдвинулся,
+#                          число привидений (uint16) и для каждого сдвинувшегося номер (uint16) и позиция (int16 x 2),
+#                          число точек (uint16) и клетки съеденных точек (uint16)
+# Снимок - разница с базой: последним снимком, который клиент подтвердил, или с началом уровня (база -1).
+# Клиент применяет снимок к своей копии базы, поэтому потерянные и пропущенные снимки ничего не ломают.
+FRAME = struct.Struct('<I')
+JOIN = struct.Struct('<cHB')
+KEY = struct.Struct('<cB')
+ACK = struct.Struct('<cI')
+WELCOME = struct.Struct('<cHq32sH')
+SNAPSHOT = struct.Struct('<cIiBHB')
+POS = struct.Struct('<hh')
+GHOST = struct.Struct('<Hhh')
+COUNT = struct.Struct('<H')
+
+PLAYER = 0
+SPECTATOR = 1
+ROLES = ('player', 'spectator')
+RESULTS = (None, 'win', 'lose')  # итог партии -> байт в снимке
+
+HISTORY = 128  # сколько тиков сервер помнит как базы для разниц, с более старой базой уходит полный снимок
+MAX_BUFFER = 64 * 1024  # если клиент не успевает читать, снимки ему пропускаются, пока буфер не освободится
+MAX_FRAME = 256  # сообщения клиентов - несколько байт; с длиной больше этой соединение закрывается
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def frame(body):
+    return FRAME.pack(len(body)) + body
+
+
+async def read_frame(reader, limit=MAX_FRAME):
+    # длина берется из сети, поэтому сначала проверяем ее, а потом читаем
+    size, = FRAME.unpack(await reader.readexactly(FRAME.size))
+    if size > limit:
+        raise ProtocolError(f'сообщение длиной {size} байт, больше {limit}')
+    return await reader.readexactly(size)
+
+
+class Connection:
+    # подключенный к сессии клиент на стороне сервера и его трафик
+    def __init__(self, writer, role, tick):
+        self.writer = writer
+        self.role = role
+        self.acked = -1  # база для следующего снимка
+        self.joined = tick
+        self.left = None
+        self.bytes = 0
+        self.snapshots = 0
+        self.skipped = 0  # снимки, пропущенные из-за полного буфера
+
+    def send(self, data):
+        self.writer.write(data)
+        self.bytes += len(data)
+
+    def busy(self):
+        return self.writer.transport.get_write_buffer_size() > MAX_BUFFER
+
+    def report(self, tick, seconds):
+        ticks = (self.left if self.left is not None else tick) - self.joined
+        return {'role': ROLES[self.role], 'bytes': self.bytes, 'snapshots': self.snapshots, 'skipped': self.skipped,
+                'bytes_per_sec': self.bytes / seconds if seconds else 0.0,
+                'bytes_per_tick': self.bytes / ticks if ticks > 0 else 0.0}
+
+
+class Session:
+    # одна партия на сервере: тикает в своей задаче и после каждого тика шлет снимки всем подключенным;
+    # все сессии сервера делят один цикл событий
+    def __init__(self, number, level, seed, ghosts=None, tick_rate=TICK_RATE, max_ticks=100000):
+        self.number = number
+        self.seed = seed
+        self.level = level
+        roster = level.roster(ghosts)
+        self.sim = Simulation(level, ghosts=roster, seed=seed)
+        self.sim.eaten = []  # съеденные за тик клетки, из них собирается журнал точек
+        self.tick_rate = tick_rate
+        self.max_ticks = max_ticks
+        self.keys = []  # кнопки игроков до следующего тика
+        self.clients = []
+        self.connections = []  # все, кто подключался, для отчета
+        self.states = {-1: (level.pacman_start, tuple(pos for pos, _ in roster))}
+        # тик -> (пакман, привидения) последних HISTORY тиков; -1 - начало уровня
+        self.eaten_ticks = []  # журнал точек: тик, на котором съедена точка, и ее клетка
+        self.eaten_cells = []
+        self.snapshots = {}  # база -> снимок текущего тика, общий для клиентов с одной базой
+        self.seconds = 0.0
+
+    def join(self, writer, role):
+        connection = Connection(writer, role, self.sim.tick)
+        connection.send(frame(WELCOME.pack(b'W', self.number, self.seed, bytes.fromhex(self.level.digest),
+                                           len(self.sim.state.ghosts))))
+        self.clients.append(connection)
+        self.connections.append(connection)
+        return connection
+
+    def leave(self, connection):
+        if connection in self.clients:
+            self.clients.remove(connection)
+            connection.left = self.sim.tick
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        sim = self.sim
+        state = sim.state
+        width = state.board.width
+        start = loop.time()
+        while sim.result is None and sim.tick < self.max_ticks:
+            for key in self.keys:
+                sim.press(key)
+            self.keys.clear()
+            sim.step()
+            for x, y in sim.eaten:
+                self.eaten_ticks.append(sim.tick)
+                self.eaten_cells.append(y * width + x)
+            sim.eaten.clear()
+            self.states[sim.tick] = (state.pacman.pos, tuple(g.pos for g in state.ghosts))
+            self.states.pop(sim.tick - HISTORY, None)
+            self.broadcast()
+            if self.tick_rate:
+                await asyncio.sleep(max(start + sim.tick / self.tick_rate - loop.time(), 0))
+            else:
+                await asyncio.sleep(0)  # без паузы, но другие сессии и клиенты тоже успевают
+        self.seconds = loop.time() - start
+        self.broadcast(final=True)
+        for connection in list(self.clients):
+            self.leave(connection)
+            connection.writer.close()  # буфер уходит до закрытия, клиент получит последний снимок
+
+    def broadcast(self, final=False):
+        self.snapshots.clear()
+        for connection in self.clients:
+            if connection.busy() and not final:
+                connection.skipped += 1
+                continue
+            connection.send(self.snapshot(connection.acked))
+            connection.snapshots += 1
+
+    def snapshot(self, base):
+        # снимок текущего тика относительно базы; если базу уже забыли, то относительно начала уровня
+        if base not in self.states:
+            base = -1
+        data = self.snapshots.get(base)
+        if data is not None:
+            return data
+        state = self.sim.state
+        pacman, ghosts = self.states[base]
+        moved = state.pacman.pos != pacman
+        body = bytearray(SNAPSHOT.pack(b'S', state.tick, base, RESULTS.index(state.result), state.score, moved))
+        if moved:
+            body += POS.pack(*state.pacman.pos)
+        changed = [(i, g.x, g.y) for i, g in enumerate(state.ghosts) if g.pos != ghosts[i]]
+        body += COUNT.pack(len(changed))
+        for ghost in changed:
+            body += GHOST.pack(*ghost)
+        cells = self.eaten_cells[bisect.bisect_right(self.eaten_ticks, base):]
+        body += COUNT.pack(len(cells))
+        body += struct.pack(f'<{len(cells)}H', *cells)
+        data = self.snapshots[base] = frame(bytes(body))
+        return data
+
+    def report(self):
+        tick = self.sim.tick
+        return {'session': self.number, 'seed': self.seed, 'result': self.sim.result or 'timeout', 'ticks': tick,
+                'seconds': self.seconds, 'ticks_per_sec': tick / self.seconds if self.seconds else 0.0,
+                'clients': [connection.report(tick, self.seconds) for connection in self.connections]}
+
+
+class Server:
+    # сессии по номерам: первая подключившаяся к номеру сторона запускает партию
+    def __init__(self, level=None, ghosts=None, seed=0, tick_rate=TICK_RATE, max_ticks=100000, on_finish=None):
+        self.level = level if level is not None else default_level()
+        self.ghosts = ghosts
+        self.seed = seed
+        self.tick_rate = tick_rate
+        self.max_ticks = max_ticks
+        self.on_finish = on_finish  # вызывается с сессией, когда ее партия закончилась
+        self.sessions = {}
+        self.tasks = []
+
+    def session(self, number):
+        session = self.sessions.get(number)
+        if session is None:
+            session = self.sessions[number] = Session(number, self.level, self.seed + number, self.ghosts,
+                                                      self.tick_rate, self.max_ticks)
+            self.tasks.append(asyncio.ensure_future(self._play(session)))
+        return session
+
+    async def _play(self, session):
+        await session.run()
+        del self.sessions[session.number]
+        if self.on_finish is not None:
+            self.on_finish(session)
+
+    async def handle(self, reader, writer):
+        session = connection = None
+        try:
+            body = await read_frame(reader)
+            if body[:1] != b'J' or len(body) != JOIN.size:
+                return
+            _, number, role = JOIN.unpack(body)
+            if role not in (PLAYER, SPECTATOR):
+                return  # неизвестная роль, в сессию не пускаем
+            session = self.session(number)
+            connection = session.join(writer, role)
+            while True:
+                body = await read_frame(reader)
+                kind = body[:1]
+                if kind == b'K' and role == PLAYER and len(body) == KEY.size:
+                    session.keys.append(body[1])
+                elif kind == b'A' and len(body) == ACK.size:
+                    connection.acked = max(connection.acked, ACK.unpack(body)[1])
+        except (asyncio.IncompleteReadError, ConnectionError, ProtocolError):
+            pass  # клиент отключился или нарушил протокол
+        finally:
+            if connection is not None:
+                session.leave(connection)
+            writer.close()
+
+
+class Client:
+    # клиент для проверки на своей машине: собирает партию из снимков, игрок жмет случайные кнопки
+    def __init__(self, level, number, role=PLAYER, seed=0):
+        self.level = level
+        self.number = number
+        self.role = role
+        self.rng = random.Random('client %d %d' % (number, seed))
+        self.states = {}  # тик -> (пакман, привидения, точки), только те, что могут стать базой
+        self.tick = -1
+        self.result = None
+        self.score = 0
+        self.received = 0
+
+    @property
+    def state(self):
+        return self.states[self.tick]
+
+    async def run(self, host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(frame(JOIN.pack(b'J', self.number, self.role)))
+        try:
+            _, number, self.seed, digest, ghosts = WELCOME.unpack(await read_frame(reader))
+            if digest.hex() != self.level.digest:
+                raise ValueError(f'сервер играет на другом уровне, не на {self.level.name}')
+            roster = self.level.roster(ghosts)
+            limit = (SNAPSHOT.size + POS.size + 2 * COUNT.size + GHOST.size * ghosts
+                     + 2 * self.level.width * self.level.height)  # самый длинный снимок
+            self.states[-1] = (self.level.pacman_start, [pos for pos, _ in roster], bytearray(self.level.dots))
+            while True:
+                body = await read_frame(reader, limit)
+                self.received += FRAME.size + len(body)
+                self.apply(body)
+                writer.write(frame(ACK.pack(b'A', self.tick)))
+                if self.role == PLAYER:
+                    key = random_agent(self, self.rng)
+                    if key is not None:
+                        writer.write(frame(KEY.pack(b'K', key)))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass  # сессия закончилась и сервер закрыл соединение
+        finally:
+            writer.close()
+
+    def apply(self, body):
+        _, tick, base, result, score, moved = SNAPSHOT.unpack_from(body)
+        pacman, ghosts, dots = self.states[base]
+        ghosts = list(ghosts)
+        dots = bytearray(dots)
+        offset = SNAPSHOT.size
+        if moved:
+            pacman = POS.unpack_from(body, offset)
+            offset += POS.size
+        count, = COUNT.unpack_from(body, offset)
+        offset += COUNT.size
+        for _ in range(count):
+            i, x, y = GHOST.unpack_from(body, offset)
+            offset += GHOST.size
+            ghosts[i] = (x, y)
+        count, = COUNT.unpack_from(body, offset)
+        for cell in struct.unpack_from(f'<{count}H', body, offset + COUNT.size):
+            dots[cell] = 0
+        self.states[tick] = (pacman, ghosts, dots)
+        for old in [old for old in self.states if 0 <= old < base]:
+            del self.states[old]  # сервер больше не возьмет их базой
+        self.tick = tick
+        self.result = RESULTS[result]
+        self.score = score
+
+
+async def loopback(sessions=4, players=1, spectators=3, level=None, ghosts=None, seed=0, tick_rate=0,
+                   max_ticks=2000):
+    # сервер и клиенты в одном цикле событий на 127.0.0.1; в конце каждый клиент сверяется с сервером
+    finished = []
+    server = Server(level, ghosts, seed, tick_rate, max_ticks, finished.append)
+    listener = await asyncio.start_server(server.handle, '127.0.0.1', 0)
+    port = listener.sockets[0].getsockname()[1]
+    clients = [Client(server.level, number, PLAYER if i < players else SPECTATOR, seed)
+               for number in range(sessions) for i in range(players + spectators)]
+    await asyncio.gather(*(client.run('127.0.0.1', port) for client in clients))
+    await asyncio.gather(*server.tasks)
+    listener.close()
+    await listener.wait_closed()
+
+    reports = []
+    for session in sorted(finished, key=lambda session: session.number):
+        state = session.sim.state
+        expected = (state.pacman.pos, [g.pos for g in state.ghosts], state.dots)
+        report = session.report()
+        report['consistent'] = all(client.tick == state.tick and client.state == expected
+                                   for client in clients if client.number == session.number)
+        reports.append(report)
+    return reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Сервер партий по сети: игроки и зрители получают снимки-разницы')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--level', help='файл уровня, по умолчанию levels/classic.txt')
+    parser.add_argument('--ghosts', type=ghost_count, help='число привидений, места уровня повторяются по кругу')
+    parser.add_argument('--seed', type=int, default=0, help='seed сессии 0, дальше seed + номер сессии')
+    parser.add_argument('--tick-rate', type=float, default=TICK_RATE, help='тиков в секунду, 0 - без пауз')
+    parser.add_argument('--max-ticks', type=int, default=100000, help='ограничение длины партии')
+    parser.add_argument('--loopback', action='store_true',
+                        help='проверка на своей машине: сервер и клиенты-боты, затем сверка и отчет')
+    parser.add_argument('--sessions', type=int, default=4, help='сколько сессий в --loopback')
+    parser.add_argument('--players', type=int, default=1, help='игроков на сессию в --loopback')
+    parser.add_argument('--spectators', type=int, default=3, help='зрителей на сессию в --loopback')
+    parser.add_argument('--json', help='куда сохранить отчет --loopback')
+    args = parser.parse_args(argv)
+
+    try:
+        level = load_level(args.level) if args.level else default_level()
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+
+    if args.loopback:
+        reports = asyncio.run(loopback(args.sessions, args.players, args.spectators, level, args.ghosts,
+                                       args.seed, args.tick_rate, args.max_ticks))
+        for report in reports:
+            traffic = ', '.join(f"{client['role']} {client['bytes_per_sec'] / 1024:.1f} KiB/s "
+                                f"({client['bytes_per_tick']:.1f} B/tick)" for client in report['clients'])
+            print(f"session {report['session']}: {report['result']} at tick {report['ticks']}, "
+                  f"{report['ticks_per_sec']:.0f} ticks/sec, consistent {report['consistent']}; {traffic}")
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(reports, f, indent=2)
+        return reports
+
+    async def serve():
+        server = Server(level, args.ghosts, args.seed, args.tick_rate, args.max_ticks,
+                        lambda session: print(json.dumps(session.report()), flush=True))
+        listener = await asyncio.start_server(server.handle, args.host, args.port)
+        async with listener:
+            await listener.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+import random
+
+from flowfield import flow_field
+from maze import MOVES
+from spatial import CellHash
+from state import GameState
+
+KEY_STEPS = {97: (-1, 0), 115: (0, 1), 100: (1, 0), 119: (0, -1)}
+# коды кнопок WASD -> сдвиг пакмана на один пиксель
+
+TICK_RATE = 1000 / 35  # тиков логики в секунду, с такой скоростью игра шла на таймерах
+
+SCATTER_TICKS = round(7 * TICK_RATE)  # 7 секунд привидения бродят, выбирая ходы случайно
+CHASE_TICKS = round(20 * TICK_RATE)  # 20 секунд идут к пакману по общему полю расстояний (см. flowfield.py)
+
+
+def chasing(tick):
+    # режим привидений на тике: разброд и погоня чередуются, партия начинается с разброда;
+    # работает и для массивов numpy с тиками
+    return tick % (SCATTER_TICKS + CHASE_TICKS) >= SCATTER_TICKS
+
+
+class Simulation:
+    # правила игры над общим состоянием GameState, без pygame и без экрана;
+    # этими же методами пользуются классы Pacman, Dots и Ghosts в pacman.py
+    def __init__(self, level=None, pacman=None, ghosts=None, seed=None, state=None):
+        self.state = state if state is not None else GameState(level, pacman, ghosts)
+        self.rng = random.Random(seed)  # у каждой партии свой генератор случайных ходов
+        self.eaten = None  # список для съеденных клеток, если их кто-то рисует (см. Dots)
+        board = self.state.board
+        self.grid = CellHash(board.width, board.height, board.cell_size)  # где какое привидение
+        for i, g in enumerate(self.state.ghosts):
+            self.grid.place(i, g.x, g.y)
+        self.flow = flow_field(board)  # поля расстояний общие для всех партий на уровне
+        self.target = None  # клетка пакмана, к которой ведет self.route
+        self.route = None
+        self.ghost_calc()  # главный цикл тоже делает один ход привидений до первого тика
+
+    @property
+    def result(self):
+        return self.state.result
+
+    @property
+    def tick(self):
+        return self.state.tick
+
+    def press(self, key):
+        # нажатие кнопки между тиками, как KEYDOWN в главном цикле
+        if self.state.result is None and key in KEY_STEPS:
+            self.state.pacman.key = key
+            self.pacman_movement(key)
+
+    def step(self):
+        # один TICK главного цикла
+        state = self.state
+        if state.result is not None:
+            return
+        pos = state.pacman.pos
+        self.ghost_calc()
+        self.eat(pos)
+        self.pacman_movement(state.pacman.key)
+        if self.collide(pos):
+            state.result = 'lose'
+        if state.remaining == 0:
+            state.result = 'win'  # по точкам, а не по очкам: за тик дается одно очко, даже если съедено две
+        state.tick += 1
+
+    def run(self, inputs=(), max_ticks=100000):
+        # inputs - пары (тик, кнопка), кнопка нажимается перед этим тиком
+        inputs = iter(inputs)
+        pending = next(inputs, None)
+        while self.state.result is None and self.state.tick < max_ticks:
+            while pending is not None and pending[0] <= self.state.tick:
+                self.press(pending[1])
+                pending = next(inputs, None)
+            self.step()
+        return self.summary()
+
+    def summary(self):
+        return {'result': self.state.result, 'score': self.state.score * 10, 'ticks': self.state.tick}
+
+    def pacman_movement(self, key):
+        # проверка возможности хода, как раньше в Pacman.pacman_movement
+        pacman = self.state.pacman
+        board = self.state.board
+        cx, cy = pacman.x, pacman.y
+        size = board.cell_size
+        width = board.width
+        if (key in (97, 100) and cy % size == 0) or (key in (119, 115) and cx % size == 0):
+            if key == 100:
+                walkable = board.walkable[cy // size * width + (cx + size + 1) // size]
+            elif key == 115:
+                walkable = board.walkable[(cy + size + 1) // size * width + cx // size]
+            elif key == 97:
+                walkable = board.walkable[cy // size * width + (cx - 1) // size]
+            else:
+                walkable = board.walkable[(cy - 1) // size * width + cx // size]
+            if walkable:
+                pacman.currentkey = key
+                self.pacman_move(key)
+        else:
+            self.pacman_move(pacman.currentkey)
+
+    def pacman_move(self, key):
+        # сдвиг пакмана на пиксель, если он не упирается в стену
+        if key not in KEY_STEPS:
+            return
+        pacman = self.state.pacman
+        board = self.state.board
+        dx, dy = KEY_STEPS[key]
+        x = pacman.x + dx
+        y = pacman.y + dy
+        if board.walkable[y // board.cell_size * board.width + x // board.cell_size]:
+            pacman.x = x
+            pacman.y = y
+
+    def ghost_calc(self):
+        # ход всех привидений, как раньше в Ghosts.ghost_calc; в погоне ход из узла берется
+        # из поля к клетке пакмана, поле меняется, только когда пакман переходит в другую клетку
+        state = self.state
+        board = state.board
+        size = board.cell_size
+        width = board.width
+        place = self.grid.place
+        route = None
+        if chasing(state.tick):
+            target = self.flow.target(state.pacman.x, state.pacman.y)
+            if target != self.target:
+                self.target = target
+                self.route = self.flow.route(target)
+            route = self.route
+        for i, g in enumerate(state.ghosts):
+            if g.x % size == 0 and g.y % size == 0:
+                if route is not None:
+                    g.move = route[g.y // size * width + g.x // size] or g.move
+                else:
+                    goodmoves = board.ghost_moves(g.y // size, g.x // size)
+                    if len(goodmoves) >= 1:
+                        g.move = goodmoves[self.rng.randint(0, len(goodmoves) - 1)]
+            if g.move:
+                dx, dy = MOVES[g.move]
+                g.x += dx
+                g.y += dy
+                place(i, g.x, g.y)
+
+    def eat(self, pos):
+        # пакман съедает все точки, которых касается, но очко дается одно за тик;
+        # возвращает клетки съеденных точек
+        state = self.state
+        size = state.board.cell_size
+        width = state.board.width
+        eaten = []
+        for y in range(pos[1] // size, (pos[1] + size - 1) // size + 1):
+            for x in range(pos[0] // size, (pos[0] + size - 1) // size + 1):
+                if state.dots[y * width + x]:
+                    state.dots[y * width + x] = 0
+                    eaten.append((x, y))
+        if eaten:
+            state.score += 1
+            state.remaining -= len(eaten)
+            if self.eaten is not None:
+                self.eaten.extend(eaten)
+        return eaten
+
+    def collide(self, pos):
+        # столкновение пакмана хотя бы с одним привидением: проверяются только привидения
+        # из соседних с пакманом клеток, сколько бы их ни было на поле
+        return next(self.grid.touching(pos[0], pos[1]), None) is not None
@@ -0,0 +1,40 @@
+class CellHash:
+    # равномерная сетка по клеткам поля: тело с номером i лежит в клетке своего левого верхнего угла;
+    # тела размером в клетку пересекаются, только если их клетки соседние, поэтому запрос
+    # смотрит 3 x 3 клетки вокруг, а не всех
+    def __init__(self, width, height, cell_size):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.buckets = [[] for _ in range(width * height)]  # клетка y * width + x -> номера тел
+        self.cells = {}  # номер -> клетка
+        self.positions = {}  # номер -> позиция в пикселях
+
+    def place(self, i, x, y):
+        # новое тело или сдвиг старого; корзина меняется, только когда тело переходит в другую клетку
+        self.positions[i] = (x, y)
+        cell = y // self.cell_size * self.width + x // self.cell_size
+        old = self.cells.get(i)
+        if old != cell:
+            if old is not None:
+                self.buckets[old].remove(i)
+            self.buckets[cell].append(i)
+            self.cells[i] = cell
+
+    def near(self, x, y):
+        # номера тел в клетке точки и в восьми соседних
+        cx = x // self.cell_size
+        cy = y // self.cell_size
+        for ny in range(max(cy - 1, 0), min(cy + 2, self.height)):
+            row = ny * self.width
+            for nx in range(max(cx - 1, 0), min(cx + 2, self.width)):
+                yield from self.buckets[row + nx]
+
+    def touching(self, x, y):
+        # тела, которые пересекаются с телом размером в клетку в точке (x, y)
+        size = self.cell_size
+        positions = self.positions
+        for i in self.near(x, y):
+            px, py = positions[i]
+            if abs(px - x) < size and abs(py - y) < size:
+                yield i
@@ -0,0 +1,46 @@
+from level import default_level
+
+
+class PacmanEntity:
+    __slots__ = ('x', 'y', 'currentkey', 'key')
+
+    def __init__(self, pos):
+        self.x, self.y = pos  # позиция в пикселях
+        self.currentkey = 0  # последний принятый ход
+        self.key = 0  # последняя нажатая кнопка, как PacmanCurrentKey в главном цикле
+
+    @property
+    def pos(self):
+        return self.x, self.y
+
+
+class GhostEntity:
+    __slots__ = ('x', 'y', 'move', 'kind')
+
+    def __init__(self, pos, kind):
+        self.x, self.y = pos  # позиция в пикселях
+        self.move = ''  # текущий ход: 'w', 'a', 's', 'd' или '' пока стоит
+        self.kind = kind  # вид привидения, от него зависит только картинка
+
+    @property
+    def pos(self):
+        return self.x, self.y
+
+
+class GameState:
+    # общее состояние одной партии, его читают и меняют все части игры
+    __slots__ = ('board', 'pacman', 'ghosts', 'dots', 'remaining', 'score', 'tick', 'result')
+
+    def __init__(self, level=None, pacman=None, ghosts=None):
+        # level - собранный уровень (см. level.py), pacman - другая начальная позиция пакмана,
+        # ghosts - другой список привидений из пар (позиция, вид), см. Level.roster
+        self.board = level if level is not None else default_level()
+        self.pacman = PacmanEntity(pacman or self.board.pacman_start)
+        self.ghosts = [GhostEntity(pos, kind) for pos, kind in (ghosts if ghosts is not None else self.board.roster())]
+
+        self.dots = bytearray(self.board.dots)  # 1 - в клетке y * width + x лежит точка
+        self.remaining = self.board.dot_count  # сколько точек осталось на поле, партия выиграна при 0
+
+        self.score = 0  # число съеденных точек, в очках это score * 10
+        self.tick = 0
+        self.result = None  # 'win' или 'lose', когда игра закончилась
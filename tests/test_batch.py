@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from batch import BatchSimulation  # noqa: E402
+from level import default_level  # noqa: E402
+from simulation import KEY_STEPS, Simulation  # noqa: E402
+
+
+def test_batch_matches_simulation_with_shared_draws():
+    n = 4
+    level = default_level()
+    batch = BatchSimulation(n, level, seed=11)
+    mirror = np.random.default_rng(11)  # тот же поток, что у batch: одна таблица (n, привидения) на вызов
+    draws = []
+
+    def row(call, game):
+        while len(draws) <= call:
+            draws.append(mirror.random((n, len(level.ghost_starts))))
+        return draws[call][game]
+
+    class Picks:
+        # randint для Simulation из заранее известных чисел в [0, 1), как выбирает batch
+        def __init__(self, values):
+            self.values = list(values)
+
+        def randint(self, a, b):
+            return a + int(self.values.pop(0) * (b - a + 1))
+
+    class Shared(Simulation):
+        def __init__(self, game):
+            self.game = game
+            self.calls = 0
+            super().__init__(level, seed=0)
+
+        def ghost_calc(self):
+            size = level.cell_size
+            values = row(self.calls, self.game)
+            self.calls += 1
+            self.rng = Picks(values[i] for i, g in enumerate(self.state.ghosts)
+                             if g.x % size == 0 and g.y % size == 0 and level.ghost_moves(g.y // size, g.x // size))
+            super().ghost_calc()
+
+    sims = [Shared(game) for game in range(n)]
+    rng = random.Random(11)
+    for tick in range(1500):
+        keys = [rng.choice(tuple(KEY_STEPS)) if tick % 25 == 0 and rng.random() < 0.8 else 0 for _ in range(n)]
+        for sim, key in zip(sims, keys):
+            if key:
+                sim.press(key)
+            sim.step()
+        batch.step(keys)
+        for game, sim in enumerate(sims):
+            state = sim.state
+            assert tuple(batch.pacman[game]) == state.pacman.pos
+            assert [tuple(pos) for pos in batch.ghosts[game]] == [g.pos for g in state.ghosts]
+            assert batch.score[game] == state.score
+            assert bool(batch.alive[game]) == (state.result is None)
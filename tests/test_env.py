@@ -0,0 +1,33 @@
+import pytest
+
+pytest.importorskip('numpy')
+
+from env import CHANNELS, PacmanEnv, VectorEnv  # noqa: E402
+
+GHOSTS = CHANNELS.index('ghosts')
+
+
+def test_ghost_count_saturates():
+    # 1024 привидения стоят на 4 местах уровня, по 256 в клетке
+    env = PacmanEnv(ghosts=1024)
+    observation, _ = env.reset(0)
+    counts = observation[GHOSTS]
+    assert counts.max() == 255 and counts.sum() == 4 * 255
+
+
+def test_vector_env_keeps_final_observation():
+    actions = [3] * 5
+    with VectorEnv(2, max_ticks=5, workers=1) as vector:
+        vector.reset(10)
+        for action in actions:
+            observations, _, terminated, truncated, info = vector.step([action, action])
+        assert truncated.all() and not terminated.any()
+        assert len(info['episodes']) == 2
+        for i in range(2):
+            env = PacmanEnv(max_ticks=5)
+            env.reset(10 + i)
+            for action in actions:
+                last = env.step(action)[0]
+            assert (info['final_observation'][i] == last).all()
+            env.reset(10 + i + 2)  # новая партия, с которой продолжил VectorEnv
+            assert (observations[i] == env.observation).all()
@@ -0,0 +1,66 @@
+import pytest
+
+import simulation
+from flowfield import flow_field
+from level import CLASSIC, compile_level, default_level, parse_text
+from maze import MOVES
+from simulation import Simulation
+
+
+def walk_level():
+    # уровень из курса без scan 9: коридоры проходятся до конца
+    with open(CLASSIC, encoding='utf-8') as f:
+        rows, cell_size, pacman, ghosts, _ = parse_text(f.read())
+    return compile_level(rows, cell_size, pacman, ghosts, 'walk')
+
+
+LEVELS = {'scan': default_level, 'walk': walk_level}
+
+
+def ghost_cells(level):
+    # клетки, по которым привидения могут пройти от своих мест, и где может стоять пакман
+    flow = flow_field(level)
+    size = level.cell_size
+    nodes = {y // size * level.width + x // size for x, y in level.ghost_starts}
+    cells = set(nodes)
+    todo = list(nodes)
+    while todo:
+        node = todo.pop()
+        for move, length, end in flow.edges[node]:
+            dx, dy = MOVES[move]
+            cells.update(node + i * (dy * level.width + dx) for i in range(1, length))
+            if end not in nodes:
+                nodes.add(end)
+                cells.add(end)
+                todo.append(end)
+    return sorted(cell for cell in cells if level.walkable[cell])
+
+
+@pytest.mark.parametrize('name', sorted(LEVELS))
+def test_route_follows_shortest_paths(name):
+    # из каждого узла ход ведет либо прямо к цели в коридоре, либо в узел, который на длину ребра ближе
+    flow = flow_field(LEVELS[name]())
+    for target in ghost_cells(LEVELS[name]()):
+        distances = flow.distances(target)
+        route = flow.route(target)
+        for node, distance in distances.items():
+            if node == target:
+                continue
+            move, length, end = next(edge for edge in flow.edges[node] if edge[0] == route[node])
+            hits = [i for start, step, i in flow.passing.get(target, ()) if start == node and step == move]
+            assert hits == [distance] or distances[end] + length == distance
+
+
+@pytest.mark.parametrize('name', sorted(LEVELS))
+def test_chasing_ghosts_catch_parked_pacman(monkeypatch, name):
+    # пакман стоит на месте в любой клетке, куда могут дойти привидения; погоня не кончается
+    monkeypatch.setattr(simulation, 'chasing', lambda tick: True)
+    level = LEVELS[name]()
+    size = level.cell_size
+    for cell in ghost_cells(level):
+        sim = Simulation(level, seed=0)
+        sim.state.pacman.x = cell % level.width * size
+        sim.state.pacman.y = cell // level.width * size
+        while sim.result is None and sim.tick < 4000:
+            sim.step()
+        assert sim.result == 'lose', (cell % level.width, cell // level.width)
@@ -0,0 +1,58 @@
+import shutil
+
+import pytest
+
+from level import CLASSIC, LevelError, compile_level, dump_cache, load_level, read_cache
+from simulation import Simulation
+
+
+def grid(*rows):
+    return [[int(char) for char in row] for row in rows]
+
+
+SMALL = grid('11111111111',
+             '13000300031',
+             '10111011101',
+             '13000300031',
+             '11111111111')
+
+
+def test_validate_accepts_small_level():
+    level = compile_level(SMALL, 25, (2, 1), [(5, 1, None)], 'small')
+    sim = Simulation(level, seed=0)
+    for _ in range(3000):
+        sim.step()
+        sim.state.result = None  # играем дальше, проверяем только ходы привидения
+        g = sim.state.ghosts[0]
+        assert level.cell(g.x // 25, g.y // 25) != 1 and level.cell((g.x + 24) // 25, (g.y + 24) // 25) != 1
+
+
+@pytest.mark.parametrize('rows, pacman, ghosts, scan', [
+    (grid('1111', '1301', '1111'), (1, 1), [(1, 1, None)], None),  # узел без ходов
+    (grid('1111111', '1111111', '1112111', '1303031', '1111111'), (2, 3), [(1, 3, None)], None),
+    # ход через стенку выхода упирается в стену
+    (SMALL, (2, 1), [(5, 1, None)], 9),  # поиск из курса не находит ходов у края
+    (grid('11111', '13031', '01111', '11111'), (2, 1), [(1, 1, None)], None),  # край поля не стена
+    (SMALL, None, [(5, 1, None)], None),  # нет пакмана
+    (SMALL, (0, 0), [(5, 1, None)], None),  # пакман в стене
+    (SMALL, (2, 1), [], None),  # нет привидений
+    (SMALL, (2, 1), [(2, 1, None)], None),  # привидение не в узле
+    (SMALL, (2, 1), [(5, 1, 'green')], None),  # неизвестный вид
+    (grid('1111', '1331', '1111'), (1, 1), [(1, 1, None)], 1),  # глубина поиска меньше 2
+])
+def test_validate_rejects_bad_levels(rows, pacman, ghosts, scan):
+    with pytest.raises(LevelError):
+        compile_level(rows, 25, pacman, ghosts, 'bad', scan=scan)
+
+
+def test_cache_round_trip(tmp_path):
+    path = tmp_path / 'classic.txt'
+    shutil.copy(CLASSIC, path)
+    level = load_level(str(path))
+    cached = load_level(str(path))  # второй раз из кэша
+    assert list((tmp_path / '.levelcache').iterdir())
+    for name in level.__slots__:
+        if name != 'graph':
+            assert getattr(cached, name) == getattr(level, name), name
+    assert (cached.graph.moves, cached.graph.edges) == (level.graph.moves, level.graph.edges)
+    assert dump_cache(read_cache(dump_cache(level))) == dump_cache(level)
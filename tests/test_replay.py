@@ -0,0 +1,56 @@
+import random
+
+from level import default_level
+from replay import Player, Recorder, Replay, fast_forward
+from simulation import Simulation
+from tournament import random_agent
+
+
+def record(path, seed, ticks):
+    # партия со случайным агентом, нажатия пишутся в path; возвращает Simulation и Recorder
+    level = default_level()
+    sim = Simulation(level, ghosts=level.roster(6), seed=seed)
+    recorder = Recorder(path, seed, 1000 / 35, level, 6)
+    rng = random.Random(seed)
+    while sim.result is None and sim.tick < ticks:
+        key = random_agent(sim, rng)
+        if key is not None:
+            recorder.record(sim.tick, key)
+            sim.press(key)
+        sim.step()
+    return sim, recorder
+
+
+def snapshot(sim):
+    state = sim.state
+    return state.pacman.pos, [g.pos for g in state.ghosts], bytes(state.dots), state.score, state.result, state.tick
+
+
+def test_replay_round_trip(tmp_path):
+    path = str(tmp_path / 'game.pmr')
+    sim, recorder = record(path, 3, 3000)
+    recorder.close(sim.tick)
+
+    level = default_level()
+    with Replay(path) as replay:
+        replay.check_level(level)
+        assert (replay.seed, replay.ghosts, replay.end_tick) == (3, 6, sim.tick)
+        again = Simulation(level, ghosts=level.roster(replay.ghosts), seed=replay.seed)
+        fast_forward(again, Player(replay, replay.end_tick))
+    assert snapshot(again) == snapshot(sim)
+
+
+def test_truncated_replay_stops_at_last_press(tmp_path):
+    # запись без close: последний тик в заголовке неизвестен
+    path = str(tmp_path / 'cut.pmr')
+    sim, recorder = record(path, 4, 400)
+    recorder.file.close()
+
+    with Replay(path) as replay:
+        last = max(tick for tick, _ in replay)
+    level = default_level()
+    with Replay(path) as replay:
+        assert replay.end_tick is None
+        again = Simulation(level, ghosts=level.roster(replay.ghosts), seed=replay.seed)
+        fast_forward(again, Player(replay, replay.end_tick))
+    assert again.tick == last
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from server import FRAME, JOIN, MAX_FRAME, ProtocolError, Server, frame, loopback, read_frame
+
+
+def test_loopback_clients_match_server():
+    reports = asyncio.run(loopback(sessions=2, players=1, spectators=2, ghosts=6, max_ticks=600))
+    assert [report['session'] for report in reports] == [0, 1]
+    for report in reports:
+        assert report['consistent']
+        assert len(report['clients']) == 3 and all(client['snapshots'] for client in report['clients'])
+
+
+def test_read_frame_rejects_long_frames():
+    async def read(data):
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await read_frame(reader)
+
+    assert asyncio.run(read(frame(b'A' * MAX_FRAME))) == b'A' * MAX_FRAME
+    with pytest.raises(ProtocolError):
+        asyncio.run(read(FRAME.pack(MAX_FRAME + 1)))
+
+
+@pytest.mark.parametrize('data', [FRAME.pack(1 << 30), frame(JOIN.pack(b'J', 0, 7))],
+                         ids=['long frame', 'unknown role'])
+def test_server_closes_bad_clients(data):
+    async def talk():
+        server = Server(tick_rate=0, max_ticks=10)
+        listener = await asyncio.start_server(server.handle, '127.0.0.1', 0)
+        reader, writer = await asyncio.open_connection(*listener.sockets[0].getsockname()[:2])
+        writer.write(data)
+        answer = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        listener.close()
+        await listener.wait_closed()
+        return answer, server.sessions, server.tasks
+
+    answer, sessions, tasks = asyncio.run(talk())
+    assert answer == b'' and not sessions and not tasks
@@ -0,0 +1,34 @@
+import pytest
+
+from simulation import SCATTER_TICKS, Simulation
+
+# Позиции из первой версии Simulation (её правила перенесены из классов Pacman, Dots и Ghosts без изменений);
+# в разброде привидения ходят так же, как тогда. Тик -> (пакман, привидения, score) перед этим тиком.
+TRACE_INPUTS = {0: 100, 40: 115, 90: 97, 140: 119, 170: 100}
+TRACE = {
+    1: {0: ((226, 300), [(201, 250), (226, 200), (224, 250), (249, 250)], 0),
+        25: ((251, 300), [(224, 250), (251, 200), (200, 249), (225, 249)], 1),
+        50: ((275, 300), [(200, 249), (276, 200), (200, 224), (225, 224)], 2),
+        100: ((264, 300), [(201, 200), (274, 200), (224, 200), (199, 200)], 2),
+        150: ((213, 300), [(251, 200), (250, 174), (174, 200), (151, 200)], 3),
+        199: ((230, 300), [(300, 200), (275, 150), (150, 225), (200, 200)], 3)},
+    7: {0: ((226, 300), [(200, 249), (226, 200), (224, 250), (249, 250)], 0),
+        25: ((251, 300), [(200, 224), (249, 200), (201, 250), (224, 250)], 1),
+        50: ((275, 300), [(200, 199), (226, 200), (225, 249), (201, 250)], 2),
+        100: ((264, 300), [(200, 151), (224, 200), (226, 200), (249, 250)], 2),
+        150: ((213, 300), [(201, 200), (226, 200), (250, 174), (201, 250)], 3),
+        199: ((230, 300), [(250, 200), (250, 175), (250, 175), (250, 250)], 3)},
+}
+
+
+@pytest.mark.parametrize('seed', sorted(TRACE))
+def test_scatter_trace_matches_recorded_positions(seed):
+    assert max(TRACE[seed]) < SCATTER_TICKS
+    sim = Simulation(seed=seed)
+    for tick in range(max(TRACE[seed]) + 1):
+        if tick in TRACE_INPUTS:
+            sim.press(TRACE_INPUTS[tick])
+        if tick in TRACE[seed]:
+            state = sim.state
+            assert (state.pacman.pos, [g.pos for g in state.ghosts], state.score) == TRACE[seed][tick]
+        sim.step()
@@ -0,0 +1,39 @@
+import random
+
+import pytest
+
+from level import MAX_GHOSTS, default_level, ghost_count
+from simulation import Simulation
+from spatial import CellHash
+
+
+def test_touching_matches_all_pairs():
+    rng = random.Random(2)
+    grid = CellHash(19, 22, 25)
+    positions = {}
+    for _ in range(3000):
+        i = rng.randrange(40)
+        positions[i] = (rng.randrange(19 * 25 - 25), rng.randrange(22 * 25 - 25))
+        grid.place(i, *positions[i])
+        x, y = rng.randrange(19 * 25 - 25), rng.randrange(22 * 25 - 25)
+        expected = {j for j, (px, py) in positions.items() if abs(px - x) < 25 and abs(py - y) < 25}
+        assert set(grid.touching(x, y)) == expected
+    assert sorted(i for bucket in grid.buckets for i in bucket) == sorted(positions)
+
+
+def test_many_ghosts_share_cells():
+    level = default_level()
+    sim = Simulation(level, ghosts=level.roster(1000), seed=1)
+    for _ in range(300):
+        sim.step()
+        sim.state.result = None  # играем дальше, проверяем только сетку
+    for i, g in enumerate(sim.state.ghosts):
+        assert sim.grid.positions[i] == g.pos
+        assert i in sim.grid.buckets[g.y // level.cell_size * level.width + g.x // level.cell_size]
+
+
+@pytest.mark.parametrize('value', [0, -1, MAX_GHOSTS + 1])
+def test_ghost_count_bounds(value):
+    with pytest.raises(ValueError):
+        ghost_count(value)
+    assert ghost_count(MAX_GHOSTS) == MAX_GHOSTS
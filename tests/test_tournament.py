@@ -0,0 +1,13 @@
+from tournament import play_game, run_tournament
+
+
+def test_tournament_does_not_depend_on_workers():
+    one, _ = run_tournament(6, seed=5, workers=1, max_ticks=600, chunk=2)
+    two, _ = run_tournament(6, seed=5, workers=2, max_ticks=600, chunk=2)
+    assert one == two
+
+
+def test_tournament_matches_single_games():
+    results, report = run_tournament(4, seed=9, workers=2, max_ticks=400, chunk=1)
+    assert results == [play_game(seed, max_ticks=400) for seed in range(9, 13)]
+    assert report['games'] == 4 and sum(worker['games'] for worker in report['per_worker']) == 4
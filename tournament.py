@@ -0,0 +1,138 @@
+import argparse
+import concurrent.futures
+import csv
+import json
+import os
+import random
+import time
+
+from level import default_level, load_level
+from simulation import KEY_STEPS, Simulation
+
+KEYS = tuple(KEY_STEPS)  # коды кнопок WASD
+
+
+def idle_agent(sim, rng):
+    # пакман стоит на месте
+    return None
+
+
+def random_agent(sim, rng):
+    # раз в 25 тиков (одна клетка) нажимаем случайную кнопку
+    if sim.tick % 25 == 0:
+        return rng.choice(KEYS)
+    return None
+
+
+AGENTS = {'idle': idle_agent, 'random': random_agent}
+
+
+def play_game(seed, agent='random', max_ticks=20000, level=None):
+    # одна партия без экрана; по одному seed она всегда проходит одинаково
+    sim = Simulation(level, seed=seed)
+    rng = random.Random('agent %d' % seed)  # генератор агента отделен от генератора привидений
+    policy = AGENTS[agent]
+    while sim.result is None and sim.tick < max_ticks:
+        key = policy(sim, rng)
+        if key is not None:
+            sim.press(key)
+        sim.step()
+    summary = sim.summary()
+    return {'seed': seed, 'result': summary['result'] or 'timeout', 'score': summary['score'],
+            'ticks': summary['ticks']}
+
+
+def play_chunk(seeds, agent, max_ticks, level_path=None):
+    # работа одного процесса: пачка партий и замер скорости;
+    # уровень передается путем, собранные таблицы процесс берет из кэша на диске
+    start = time.perf_counter()
+    level = load_level(level_path) if level_path else default_level()
+    games = [play_game(seed, agent, max_ticks, level) for seed in seeds]
+    elapsed = time.perf_counter() - start
+    ticks = sum(game['ticks'] for game in games)
+    worker = {'pid': os.getpid(), 'games': len(games), 'ticks': ticks, 'seconds': elapsed,
+              'steps_per_sec': ticks / elapsed if elapsed else 0.0}
+    return games, worker
+
+
+def run_tournament(games, seed=0, agent='random', workers=None, max_ticks=20000, chunk=64, level_path=None):
+    workers = workers or os.cpu_count() or 1
+    seeds = list(range(seed, seed + games))
+    chunks = [seeds[i:i + chunk] for i in range(0, len(seeds), chunk)]
+    results = []
+    per_worker = {}
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(play_chunk, part, agent, max_ticks, level_path) for part in chunks]
+        for future in futures:
+            part, worker = future.result()
+            results.extend(part)
+            total = per_worker.setdefault(worker['pid'], {'pid': worker['pid'], 'games': 0,
+                                                          'ticks': 0, 'seconds': 0.0})
+            total['games'] += worker['games']
+            total['ticks'] += worker['ticks']
+            total['seconds'] += worker['seconds']
+    elapsed = time.perf_counter() - start
+    for total in per_worker.values():
+        total['steps_per_sec'] = total['ticks'] / total['seconds'] if total['seconds'] else 0.0
+    return results, summarize(results, list(per_worker.values()), elapsed, agent, seed, workers)
+
+
+def summarize(results, per_worker, elapsed, agent, seed, workers):
+    count = len(results) or 1
+    ticks = sum(game['ticks'] for game in results)
+    return {
+        'agent': agent,
+        'seed': seed,
+        'games': len(results),
+        'workers': workers,
+        'win_rate': sum(game['result'] == 'win' for game in results) / count,
+        'loss_rate': sum(game['result'] == 'lose' for game in results) / count,
+        'mean_score': sum(game['score'] for game in results) / count,
+        'max_score': max((game['score'] for game in results), default=0),
+        'mean_ticks': ticks / count,
+        'seconds': elapsed,
+        'steps_per_sec': ticks / elapsed if elapsed else 0.0,
+        'per_worker': per_worker,
+    }
+
+
+def write_csv(path, results):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['seed', 'result', 'score', 'ticks'])
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Турнир партий без экрана на нескольких процессах')
+    parser.add_argument('--games', type=int, default=1000, help='сколько партий сыграть')
+    parser.add_argument('--seed', type=int, default=0, help='seed первой партии, дальше seed + 1, ...')
+    parser.add_argument('--agent', choices=sorted(AGENTS), default='random')
+    parser.add_argument('--workers', type=int, default=None, help='число процессов, по умолчанию все ядра')
+    parser.add_argument('--max-ticks', type=int, default=20000, help='ограничение длины партии')
+    parser.add_argument('--level', help='файл уровня, по умолчанию levels/classic.txt')
+    parser.add_argument('--csv', help='файл для результатов каждой партии')
+    parser.add_argument('--json', help='файл для общего отчета')
+    args = parser.parse_args(argv)
+
+    if args.level:
+        try:
+            load_level(args.level)  # проверка и сборка до запуска процессов, они возьмут кэш
+        except (OSError, ValueError) as error:
+            parser.error(str(error))
+    results, report = run_tournament(args.games, args.seed, args.agent, args.workers, args.max_ticks,
+                                     level_path=args.level)
+    if args.csv:
+        write_csv(args.csv, results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(f"games {report['games']}  win rate {report['win_rate']:.3f}  "
+          f"mean score {report['mean_score']:.1f}  mean ticks {report['mean_ticks']:.0f}  "
+          f"steps/sec {report['steps_per_sec']:.0f}")
+    return report
+
+
+if __name__ == '__main__':
+    main()